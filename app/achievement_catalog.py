@@ -0,0 +1,75 @@
+# app/achievement_catalog.py
+import hashlib
+import json
+import os
+import threading
+import time
+from sqlalchemy.orm import Session
+from app.models import Achievement
+
+# How long the in-process copy is trusted before it is reloaded from the database
+CATALOG_TTL_SECONDS = int(os.getenv("ACHIEVEMENT_CATALOG_TTL_SECONDS", "3600"))
+
+
+def normalise_icon(fa_icon_class: str) -> str:
+    """
+    Strips the "fas " prefix the frontend doesn't expect, falling back to a placeholder icon.
+    """
+    if fa_icon_class and "fa-" in fa_icon_class:
+        return fa_icon_class.replace("fas ", "").strip()
+    return "question-circle"
+
+
+class AchievementCatalog:
+    """
+    Process-wide copy of the achievements table, indexed by id and by name.
+    Reloaded when the TTL expires or when `invalidate()` is called.
+    """
+
+    def __init__(self, ttl_seconds: int = CATALOG_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.by_id = {}
+        self.by_name = {}
+        self.entries = []  # Ready-to-serve rows for /all-achievements
+        self.etag = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> "AchievementCatalog":
+        """
+        Returns the catalog, loading it first if it is empty or stale.
+        """
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._load(db)
+        return self
+
+    def invalidate(self):
+        """
+        Forces the next `get()` to reload from the database.
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def _load(self, db: Session):
+        achievements = db.query(Achievement).order_by(Achievement.id).all()
+
+        entries = [
+            {"id": ach.id, "name": ach.name, "fa_icon_class": normalise_icon(ach.fa_icon_class)}
+            for ach in achievements
+        ]
+
+        # Swap in the new indexes in one go so readers never see a half-built catalog
+        self.by_id = {entry["id"]: entry for entry in entries}
+        self.by_name = {entry["name"]: entry for entry in entries}
+        self.entries = entries
+        self.etag = '"' + hashlib.sha1(json.dumps(entries, sort_keys=True).encode()).hexdigest() + '"'
+        self._loaded_at = time.monotonic()
+        print(f" Achievement catalog loaded: {len(entries)} achievements")
+
+
+catalog = AchievementCatalog()
@@ -0,0 +1,97 @@
+# app/achievement_rules.py
+"""
+Declarative achievement rules. Each rule names an achievement (matching achievements.name)
+and the minimum value of every stat it needs; all of them must be met.
+
+Stats are "<activity type>.<stat>", where <stat> is one of:
+    streak      - current streak (the best streak when recomputing offline)
+    total_logs  - activities logged
+    early_logs  - activities logged before 06:00 UTC
+    late_logs   - activities logged at or after 22:00 UTC
+
+Adding an achievement means adding its row to the achievements table and a rule here.
+"""
+ACTIVITY_TYPES = ["workout", "meal"]
+STAT_NAMES = ["streak", "total_logs", "early_logs", "late_logs"]
+
+ACHIEVEMENT_RULES = [
+    # Workout streaks
+    {"name": "7-Day Workout Streak", "requires": {"workout.streak": 7}},
+    {"name": "14-Day Workout Streak", "requires": {"workout.streak": 14}},
+    {"name": "30-Day Workout Streak", "requires": {"workout.streak": 30}},
+    {"name": "60-Day Workout Streak", "requires": {"workout.streak": 60}},
+    # Workout totals
+    {"name": "First Workout Completed", "requires": {"workout.total_logs": 1}},
+    {"name": "10 Workouts Completed", "requires": {"workout.total_logs": 10}},
+    {"name": "25 Workouts Completed", "requires": {"workout.total_logs": 25}},
+    {"name": "50 Workouts Completed", "requires": {"workout.total_logs": 50}},
+    {"name": "100 Workouts Completed", "requires": {"workout.total_logs": 100}},
+    # Meal streaks
+    {"name": "7-Day Meal Logging Streak", "requires": {"meal.streak": 7}},
+    {"name": "14-Day Meal Logging Streak", "requires": {"meal.streak": 14}},
+    {"name": "30-Day Meal Logging Streak", "requires": {"meal.streak": 30}},
+    {"name": "60-Day Meal Logging Streak", "requires": {"meal.streak": 60}},
+    # Meal totals
+    {"name": "First Meal Logged", "requires": {"meal.total_logs": 1}},
+    {"name": "10 Meals Logged", "requires": {"meal.total_logs": 10}},
+    {"name": "25 Meals Logged", "requires": {"meal.total_logs": 25}},
+    {"name": "50 Meals Logged", "requires": {"meal.total_logs": 50}},
+    {"name": "100 Meals Logged", "requires": {"meal.total_logs": 100}},
+    # Special achievements
+    {"name": "Consistency King", "requires": {"workout.total_logs": 30, "meal.total_logs": 30}},
+    {"name": "Halfway to Transformation", "requires": {"workout.total_logs": 50, "meal.total_logs": 50}},
+    {"name": "Fitness Legend", "requires": {"workout.total_logs": 100, "meal.total_logs": 100}},
+    {"name": "Early Riser", "requires": {"workout.early_logs": 10}},
+    {"name": "Night Owl", "requires": {"workout.late_logs": 10}},
+]
+
+
+class CompiledRules:
+    """
+    Rules validated and indexed once: which rules an activity type can affect,
+    and the union of stats those rules read.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = []  # (name, ((stat, threshold), ...))
+        self.by_type = {activity_type: [] for activity_type in ACTIVITY_TYPES}
+
+        for rule in rules:
+            conditions = tuple(sorted(rule["requires"].items()))
+            if not conditions:
+                raise ValueError(f"Achievement rule '{rule['name']}' has no requirements")
+            for stat, threshold in conditions:
+                activity_type, _, stat_name = stat.partition(".")
+                if activity_type not in ACTIVITY_TYPES or stat_name not in STAT_NAMES:
+                    raise ValueError(f"Achievement rule '{rule['name']}' uses unknown stat '{stat}'")
+            compiled = (rule["name"], conditions)
+            self.rules.append(compiled)
+            for activity_type in {stat.partition(".")[0] for stat, _ in conditions}:
+                self.by_type[activity_type].append(compiled)
+
+        self.stats_by_type = {
+            activity_type: {stat for _, conditions in rules_for_type for stat, _ in conditions}
+            for activity_type, rules_for_type in self.by_type.items()
+        }
+
+    def required_stats(self, activity_type: str = None) -> set:
+        """
+        Every stat read by the rules a log of `activity_type` can affect (all rules if None).
+        """
+        if activity_type is None:
+            return set().union(*self.stats_by_type.values())
+        return self.stats_by_type[activity_type]
+
+    def evaluate(self, stats: dict, activity_type: str = None) -> list:
+        """
+        Returns the names of every rule `stats` satisfies, in one pass over the relevant rules.
+        Missing stats count as 0.
+        """
+        rules = self.rules if activity_type is None else self.by_type[activity_type]
+        return [
+            name for name, conditions in rules
+            if all(stats.get(stat, 0) >= threshold for stat, threshold in conditions)
+        ]
+
+
+RULES = CompiledRules(ACHIEVEMENT_RULES)
@@ -5,12 +5,11 @@ import torch
 import os
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
 
 sys.path.append(r"C:\Users\hassa\WellnessProject")
 from postprocess_output import postprocess_output
 from app.database import get_db
-from app.models import User, LoggedMeal, Streak
+from app.models import User, DailyNutrition, Streak
 
 router = APIRouter(prefix="/ai", tags=["AI Suggestions"])
 
@@ -48,15 +47,15 @@ def get_user_suggestions(user_id: int, db: Session = Depends(get_db)):
     today = datetime.datetime.utcnow().date()
     seven_days_ago = today - datetime.timedelta(days=6)
 
-    # Pull meals from last 7 days
+    # Pull daily totals for the last 7 days from the rollup
     meals = db.query(
-        func.date(LoggedMeal.timestamp).label("day"),
-        func.sum(LoggedMeal.calories).label("daily_calories"),
-        func.sum(LoggedMeal.protein).label("daily_protein")
+        DailyNutrition.day,
+        DailyNutrition.calories.label("daily_calories"),
+        DailyNutrition.protein.label("daily_protein")
     ).filter(
-        LoggedMeal.user_id == user_id,
-        func.date(LoggedMeal.timestamp) >= seven_days_ago
-    ).group_by(func.date(LoggedMeal.timestamp)).all()
+        DailyNutrition.user_id == user_id,
+        DailyNutrition.day >= seven_days_ago
+    ).all()
 
     if meals:
         total_calories = sum(m.daily_calories or 0 for m in meals)
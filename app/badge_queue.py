@@ -0,0 +1,105 @@
+# app/badge_queue.py
+import os
+import queue
+import threading
+import time
+
+# Number of background threads evaluating badges
+BADGE_WORKERS = int(os.getenv("BADGE_WORKERS", "2"))
+# Tries per event before it is left pending for the next restart
+BADGE_MAX_ATTEMPTS = int(os.getenv("BADGE_MAX_ATTEMPTS", "3"))
+# Seconds between runs of the pruner (deleting old processed events)
+BADGE_PRUNE_INTERVAL = float(os.getenv("BADGE_PRUNE_INTERVAL", "3600"))
+
+
+class BadgeQueue:
+    """
+    In-process work queue for badge evaluation, fed with badge_outbox event IDs.
+    Events are sharded by user ID so each user's events are handled in order by one thread.
+    The handler must tolerate the same event arriving twice (every worker process re-queues
+    the pending outbox at startup); evaluate_badge_event claims the event before running it.
+    Workers also call `pruner` at most once per `prune_interval`, after handling an event.
+    """
+
+    def __init__(self, handler, workers: int = BADGE_WORKERS, max_attempts: int = BADGE_MAX_ATTEMPTS,
+                 pruner=None, prune_interval: float = BADGE_PRUNE_INTERVAL):
+        self.handler = handler  # Called with an event ID
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.pruner = pruner  # Called with no arguments; returns how many events it deleted
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._queues = [queue.Queue() for _ in range(self.workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.last_lag_seconds = None  # Enqueue-to-done time of the latest event
+        self.pruned = 0
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, pending=()):
+        """
+        Starts the worker threads, first re-queueing `pending` (event_id, user_id) pairs left in the outbox.
+        """
+        for event_id, user_id in pending:
+            self.submit(event_id, user_id)
+        self._threads = [
+            threading.Thread(target=self._work, args=(shard,), name=f"badge-worker-{index}", daemon=True)
+            for index, shard in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f" Badge queue started: {self.workers} workers, {self.depth()} pending events")
+
+    def stop(self, timeout: float = 5.0):
+        for shard in self._queues:
+            shard.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, event_id: int, user_id: int):
+        self._queues[user_id % self.workers].put((event_id, time.monotonic()))
+
+    def depth(self) -> int:
+        return sum(shard.qsize() for shard in self._queues)
+
+    def _work(self, shard: queue.Queue):
+        while True:
+            item = shard.get()
+            if item is None:
+                return
+            event_id, enqueued_at = item
+
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    self.handler(event_id)
+                    with self._lock:
+                        self.processed += 1
+                        self.last_lag_seconds = time.monotonic() - enqueued_at
+                    break
+                except Exception as e:
+                    print(f"❌ ERROR: Badge event {event_id} failed (attempt {attempt}/{self.max_attempts}): {e}")
+                    time.sleep(0.1 * 2 ** attempt)
+            else:
+                with self._lock:
+                    self.failed += 1
+
+            self._maybe_prune()
+
+    def _maybe_prune(self):
+        with self._lock:
+            if self.pruner is None or time.monotonic() < self._next_prune:
+                return
+            self._next_prune = time.monotonic() + self.prune_interval
+        try:
+            deleted = self.pruner()
+        except Exception as e:
+            print(f"❌ ERROR: Badge outbox pruning failed: {e}")
+            return
+        with self._lock:
+            self.pruned += deleted
@@ -1,39 +1,190 @@
 # app/community.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import delete, func, literal, literal_column, select, tuple_, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, contains_eager
+from app.community_hub import community_hub
+from app.database import dialect_insert, get_db
+from app.feed_cache import feed_cache
+from app.http_cache import etag_matches, not_modified
+from app.pagination import decode_cursor, encode_cursor
+from app.search_index import MATCH_START, MATCH_STOP, highlight, render_headline, search_index, terms
 from app import models, schemas
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
+FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 100
+COMMENTS_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+# ts_headline options; the markers are turned into <b></b> by render_headline after escaping
+HEADLINE_OPTIONS = f"StartSel={MATCH_START}, StopSel={MATCH_STOP}, MaxWords=35, MinWords=15"
+
+FEED_PAGE = TypeAdapter(List[schemas.PostResponse])  # Renders a page straight to JSON bytes for the cache
+
+# ------------------- Helpers ------------------- #
+
+def user_public(user: models.User) -> schemas.UserPublic:
+    return schemas.UserPublic(
+        id=user.id,
+        full_name=user.full_name,
+        username=user.username,
+        profile_picture=user.profile_picture,
+    )
+
+
+def post_response(post: models.Post, user: models.User) -> schemas.PostResponse:
+    return schemas.PostResponse(
+        id=post.id,
+        content=post.content,
+        media_url=post.media_url,
+        likes=post.likes,
+        comment_count=post.comment_count or 0,
+        date_posted=post.date_posted,
+        user=user_public(user),
+    )
+
+
+def comment_response(comment: models.Comment, user: models.User) -> schemas.CommentResponse:
+    return schemas.CommentResponse(
+        id=comment.id,
+        post_id=comment.post_id,
+        content=comment.content,
+        date_posted=comment.date_posted,
+        user=user_public(user),
+    )
+
+
+def load_feed_page(cursor: Optional[str], limit: int, db: Session):
+    """
+    Returns one feed page as (posts, next_cursor); next_cursor is None on the last page.
+    """
+    query = (
+        db.query(models.Post)
+        .join(models.Post.user)
+        .options(contains_eager(models.Post.user))
+        .order_by(models.Post.date_posted.desc(), models.Post.id.desc())
+    )
+    if cursor:
+        date_posted, post_id = decode_cursor(cursor)
+        query = query.filter(tuple_(models.Post.date_posted, models.Post.id) < tuple_(date_posted, post_id))
+
+    posts = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(posts[-1].date_posted, posts[-1].id)
+
+    return [post_response(post, post.user) for post in posts], next_cursor
+
+
+def search_postgres(q: str, offset: int, limit: int, db: Session) -> list:
+    """
+    Ranked matches from the GIN full-text indexes; ts_headline only runs on the returned page.
+    """
+    query = func.websearch_to_tsquery(models.SEARCH_CONFIG, q)
+    matches = [
+        select(
+            literal(doc_type).label("type"),
+            model.id,
+            post_id.label("post_id"),
+            model.user_id,
+            model.date_posted,
+            model.content,
+            func.ts_rank_cd(models.search_vector(model.content), query).label("rank"),
+        ).where(models.search_vector(model.content).bool_op("@@")(query))
+        for doc_type, model, post_id in (("post", models.Post, models.Post.id), ("comment", models.Comment, models.Comment.post_id))
+    ]
+    ranked = union_all(*matches).order_by(
+        literal_column("rank").desc(), literal_column("date_posted").desc()
+    ).limit(limit).offset(offset).subquery()
+
+    content = func.replace(func.replace(ranked.c.content, MATCH_START, ""), MATCH_STOP, "")
+    page = select(
+        ranked.c.type, ranked.c.id, ranked.c.post_id, ranked.c.user_id, ranked.c.date_posted, ranked.c.rank,
+        func.ts_headline(models.SEARCH_CONFIG, content, query, HEADLINE_OPTIONS).label("snippet"),
+    ).order_by(ranked.c.rank.desc(), ranked.c.date_posted.desc())
+    return [
+        {**row._mapping, "snippet": render_headline(row.snippet)}
+        for row in db.execute(page)
+    ]
+
+
+def search_local(q: str, offset: int, limit: int, db: Session) -> list:
+    """
+    Ranked matches from the in-process index (SQLite); content is read back only for the returned page.
+    """
+    _, page = search_index.get(db).search(q, offset, limit)
+    ids = {"post": [], "comment": []}
+    for doc_type, doc_id, *_ in page:
+        ids[doc_type].append(doc_id)
+    content = {("post", row.id): row.content for row in db.query(models.Post.id, models.Post.content).filter(models.Post.id.in_(ids["post"]))}
+    content.update({("comment", row.id): row.content for row in db.query(models.Comment.id, models.Comment.content).filter(models.Comment.id.in_(ids["comment"]))})
+
+    query_terms = set(terms(q))
+    return [
+        {"type": doc_type, "id": doc_id, "post_id": post_id, "user_id": user_id, "date_posted": date_posted,
+         "rank": score, "snippet": highlight(content.get((doc_type, doc_id), ""), query_terms)}
+        for doc_type, doc_id, post_id, user_id, date_posted, score in page
+    ]
+
+
+def update_like_count(post_id: int, delta: int, db: Session) -> int:
+    """
+    Applies `delta` to posts.likes with one UPDATE ... RETURNING (a plain read when delta is 0).
+    Rolls back and raises 404 if the post doesn't exist.
+    """
+    if delta:
+        likes = db.execute(
+            update(models.Post)
+            .where(models.Post.id == post_id)
+            .values(likes=func.coalesce(models.Post.likes, 0) + delta)
+            .returning(models.Post.likes)
+        ).scalar()
+    else:
+        likes = db.query(func.coalesce(models.Post.likes, 0)).filter(models.Post.id == post_id).scalar()
+
+    if likes is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Post not found")
+    return likes
+
 # ------------------- Community Routes ------------------- #
 
 @router.get("/posts", response_model=List[schemas.PostResponse])
-def get_posts(db: Session = Depends(get_db)):
-    posts = db.query(models.Post).all()
-
-    post_responses = []
-    for post in posts:
-        user = db.query(models.User).filter(models.User.id == post.user_id).first()
-        if user:
-            post_responses.append(
-                schemas.PostResponse(
-                    id=post.id,
-                    content=post.content,
-                    media_url=post.media_url,
-                    likes=post.likes,
-                    date_posted=post.date_posted,
-                    user=schemas.UserPublic(
-                        id=user.id,
-                        full_name=user.full_name,
-                        username=user.username,
-                        profile_picture=user.profile_picture,
-                    ),
-                )
-            )
-    return post_responses
+def get_posts(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """
+    Newest-first feed, one page at a time. Authors are joined in the same query.
+    The cursor for the next page is returned in the X-Next-Cursor header (absent on the last page).
+    Pages are served from the feed cache; a poll with the current ETag gets a 304 after one primary-key read.
+    """
+    version = feed_cache.version(db)
+    etag = feed_cache.etag(cursor, limit, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    page = feed_cache.get(cursor, limit, version)
+    if page is None:
+        posts, next_cursor = load_feed_page(cursor, limit, db)
+        page = FEED_PAGE.dump_json(posts), next_cursor
+        feed_cache.put(cursor, limit, version, *page)
+
+    body, next_cursor = page
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.post("/create-post", response_model=schemas.PostResponse)
@@ -46,6 +197,8 @@ def create_post(post: schemas.PostCreate, db: Session = Depends(get_db)):
         media_url=post.media_url or None,
     )
     db.add(new_post)
+    db.flush()
+    feed_cache.bump(db)
     db.commit()
     db.refresh(new_post)
 
@@ -53,83 +206,185 @@ def create_post(post: schemas.PostCreate, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return schemas.PostResponse(
-        id=new_post.id,
-        content=new_post.content,
-        media_url=new_post.media_url,
-        likes=new_post.likes,
-        date_posted=new_post.date_posted,
-        user=schemas.UserPublic(
-            id=user.id,
-            full_name=user.full_name,
-            username=user.username,
-            profile_picture=user.profile_picture,
-        ),
-    )
+    search_index.add("post", new_post.id, new_post.id, new_post.user_id, new_post.date_posted, new_post.content)
+    created = post_response(new_post, user)
+    community_hub.publish("post", created.model_dump(mode="json"))
+    return created
 
 
 @router.get("/comments/{post_id}", response_model=List[schemas.CommentResponse])
-def get_comments(post_id: int, db: Session = Depends(get_db)):
-    comments = db.query(models.Comment).filter(models.Comment.post_id == post_id).all()
-
-    comment_responses = []
-    for comment in comments:
-        user = db.query(models.User).filter(models.User.id == comment.user_id).first()
-        if user:
-            comment_responses.append(
-                schemas.CommentResponse(
-                    id=comment.id,
-                    post_id=comment.post_id,
-                    content=comment.content,
-                    date_posted=comment.date_posted,
-                    user=schemas.UserPublic(
-                        id=user.id,
-                        full_name=user.full_name,
-                        username=user.username,
-                        profile_picture=user.profile_picture,
-                    ),
-                )
-            )
-    return comment_responses
+def get_comments(
+    post_id: int,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: int = Query(COMMENTS_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """
+    Oldest-first comments on a post, one page at a time, with authors joined in the same query.
+    """
+    query = (
+        db.query(models.Comment)
+        .join(models.Comment.user)
+        .options(contains_eager(models.Comment.user))
+        .filter(models.Comment.post_id == post_id)
+        .order_by(models.Comment.date_posted, models.Comment.id)
+    )
+    if cursor:
+        date_posted, comment_id = decode_cursor(cursor)
+        query = query.filter(tuple_(models.Comment.date_posted, models.Comment.id) > tuple_(date_posted, comment_id))
+
+    comments = query.limit(limit + 1).all()
+    if len(comments) > limit:
+        comments = comments[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(comments[-1].date_posted, comments[-1].id)
+
+    return [comment_response(comment, comment.user) for comment in comments]
 
 
 @router.post("/add-comment", response_model=schemas.CommentResponse)
 def add_comment(comment: schemas.CommentCreate, db: Session = Depends(get_db)):
     # moderation removed for testing
 
+    user = db.query(models.User).filter(models.User.id == comment.user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    #  Bump the post's counter in the database so concurrent comments can't overwrite each other
+    comment_count = db.execute(
+        update(models.Post)
+        .where(models.Post.id == comment.post_id)
+        .values(comment_count=models.Post.comment_count + 1)
+        .returning(models.Post.comment_count)
+    ).scalar()
+    if comment_count is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Post not found")
+
     new_comment = models.Comment(
         post_id=comment.post_id,
         user_id=comment.user_id,
         content=comment.content,
     )
     db.add(new_comment)
+    db.flush()
+    feed_cache.bump(db)  # comment_count changed
     db.commit()
     db.refresh(new_comment)
 
-    user = db.query(models.User).filter(models.User.id == comment.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    search_index.add("comment", new_comment.id, new_comment.post_id, new_comment.user_id, new_comment.date_posted, new_comment.content)
+    created = comment_response(new_comment, user)
+    community_hub.publish("comment", {**created.model_dump(mode="json"), "comment_count": comment_count})
+    return created
 
-    return schemas.CommentResponse(
-        id=new_comment.id,
-        post_id=new_comment.post_id,
-        content=new_comment.content,
-        date_posted=new_comment.date_posted,
-        user=schemas.UserPublic(
-            id=user.id,
-            full_name=user.full_name,
-            username=user.username,
-            profile_picture=user.profile_picture,
-        ),
-    )
 
+@router.get("/search", response_model=schemas.SearchResponse)
+def search_community(
+    q: str = Query(..., min_length=2, max_length=200),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text search over posts and comments, best match first.
+    Every word must match; snippets are HTML-escaped, with matched words wrapped in <b></b>.
+    """
+    search = search_local if db.get_bind().dialect.name == "sqlite" else search_postgres
+    rows = search(q, offset, limit + 1, db)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    users = {
+        user.id: user
+        for user in db.query(models.User).filter(models.User.id.in_({row["user_id"] for row in rows}))
+    }
+    results = [
+        schemas.SearchResult(
+            type=row["type"],
+            id=row["id"],
+            post_id=row["post_id"],
+            snippet=row["snippet"],
+            rank=row["rank"],
+            date_posted=row["date_posted"],
+            user=user_public(users[row["user_id"]]),
+        )
+        for row in rows
+        if row["user_id"] in users
+    ]
+    return {"query": q, "results": results, "next_offset": offset + limit if has_more else None}
 
-@router.post("/like/{post_id}")
-def like_post(post_id: int, db: Session = Depends(get_db)):
-    post = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
 
-    post.likes += 1 if not post.likes else -1
+@router.post("/like/{post_id}", response_model=schemas.PostLikeResponse)
+def like_post(post_id: int, like: schemas.PostLikeRequest, db: Session = Depends(get_db)):
+    """
+    Likes a post for the user. Liking an already-liked post changes nothing.
+    """
+    #  Step 1: Record the like; the (post_id, user_id) unique key makes a repeat a no-op
+    try:
+        added = db.execute(
+            dialect_insert(db, models.PostLike.__table__)
+            .values(post_id=post_id, user_id=like.user_id, created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+        ).rowcount
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Post or user not found")
+
+    #  Step 2: Move the counter in the database, in the same transaction as the ledger row
+    likes = update_like_count(post_id, 1 if added else 0, db)
+    if added:
+        feed_cache.bump(db)
     db.commit()
-    return {"message": "Like toggled successfully", "likes": post.likes}
+    if added:
+        community_hub.publish("likes", {"post_id": post_id, "likes": likes, "delta": 1})
+    return {"message": "Post liked" if added else "Post already liked", "post_id": post_id, "liked": True, "likes": likes}
+
+
+@router.delete("/like/{post_id}", response_model=schemas.PostLikeResponse)
+def unlike_post(post_id: int, user_id: int = Query(...), db: Session = Depends(get_db)):
+    """
+    Removes the user's like. Unliking a post that isn't liked changes nothing.
+    """
+    removed = db.execute(
+        delete(models.PostLike).where(models.PostLike.post_id == post_id, models.PostLike.user_id == user_id)
+    ).rowcount
+
+    likes = update_like_count(post_id, -1 if removed else 0, db)
+    if removed:
+        feed_cache.bump(db)
+    db.commit()
+    if removed:
+        community_hub.publish("likes", {"post_id": post_id, "likes": likes, "delta": -1})
+    return {"message": "Like removed" if removed else "Post not liked", "post_id": post_id, "liked": False, "likes": likes}
+
+
+@router.get("/stream")
+async def stream_community():
+    """
+    Server-Sent Events feed of live updates: "post" (a new PostResponse), "comment"
+    (a new CommentResponse plus the post's comment_count) and "likes" ({post_id, likes, delta}).
+    A "reset" event means the client fell behind and should reload /community/posts before reconnecting.
+    """
+    subscriber = community_hub.subscribe()
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many live connections, poll /community/posts instead")
+
+    return StreamingResponse(
+        community_hub.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stream/metrics")
+def get_stream_metrics():
+    """
+    Subscriber count and fan-out counters for this worker's live update hub.
+    """
+    return {
+        "subscribers": len(community_hub.subscribers),
+        "max_subscribers": community_hub.max_subscribers,
+        "published": community_hub.published,
+        "delivered": community_hub.delivered,
+        "disconnected_slow": community_hub.disconnected_slow,
+    }
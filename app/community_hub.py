@@ -0,0 +1,189 @@
+# app/community_hub.py
+import asyncio
+import json
+import os
+import select
+import threading
+from sqlalchemy import text
+
+# Events buffered per subscriber before it is treated as a slow consumer and disconnected
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+# Open /community/stream connections allowed per worker process
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "10000"))
+# Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+# PostgreSQL NOTIFY channel carrying published events to every worker process
+STREAM_CHANNEL = "community_stream"
+# NOTIFY payloads must be shorter than 8000 bytes; larger events only reach this process
+NOTIFY_MAX_BYTES = 7999
+
+# Sent to a subscriber that fell behind, just before its stream is closed
+SLOW_CONSUMER_MESSAGE = "event: reset\ndata: {\"reason\": \"slow consumer\"}\n\n"
+# Sent to every subscriber of a worker whose NOTIFY listener lost its connection
+MISSED_UPDATES_MESSAGE = "event: reset\ndata: {\"reason\": \"missed updates\"}\n\n"
+
+
+def sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue()  # Bounded by CommunityHub.queue_size in _fan_out
+
+
+class CommunityHub:
+    """
+    Pub/sub for live community updates. Route handlers publish from worker threads;
+    messages are encoded once and fanned out on the event loop into one bounded queue per
+    subscriber. A subscriber whose queue is full is disconnected (after a "reset" event
+    telling it to refetch the feed) instead of slowing everyone else down.
+    On PostgreSQL, publish() sends the message with NOTIFY and every worker process's hub
+    fans out what its LISTEN connection receives, so subscribers see writes handled by any
+    worker; with other databases (SQLite, one process) messages go straight to the fan-out.
+    """
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE, max_subscribers: int = STREAM_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.published = 0
+        self.delivered = 0
+        self.disconnected_slow = 0
+        self._loop = None
+        self._engine = None  # Set on PostgreSQL: publish through NOTIFY
+        self._listener = None
+        self._stopping = threading.Event()
+
+    def start(self, loop: asyncio.AbstractEventLoop, engine=None):
+        self._loop = loop
+        if engine is not None and engine.dialect.name == "postgresql":
+            self._engine = engine
+            self._stopping.clear()
+            self._listener = threading.Thread(target=self._listen, name="community-listener", daemon=True)
+            self._listener.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.join(5.0)
+            self._listener = None
+        self._engine = None
+        for subscriber in list(self.subscribers):
+            self._close(subscriber, None)
+        self._loop = None
+
+    def subscribe(self):
+        """
+        Returns a new Subscriber, or None when the worker is at max_subscribers.
+        """
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: dict):
+        """
+        Thread-safe; call after the change is committed. A no-op until the hub is started.
+        """
+        message = sse_message(event, data)
+        engine = self._engine
+        if engine is not None:
+            if len(message.encode()) <= NOTIFY_MAX_BYTES:
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(text("SELECT pg_notify(:channel, :message)"), {"channel": STREAM_CHANNEL, "message": message})
+                        conn.commit()
+                    return
+                except Exception as e:
+                    print(f"❌ ERROR: Community NOTIFY failed, delivering to this worker only: {e!r}")
+            else:
+                print(f"⚠️ Community {event} event too large for NOTIFY, delivering to this worker only")
+        self._deliver(message)
+
+    def _deliver(self, message: str):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._fan_out, message)
+
+    def _listen(self):
+        """
+        Listener thread (PostgreSQL, psycopg2): forwards every NOTIFY on STREAM_CHANNEL to the
+        fan-out, reconnecting after errors. Subscribers are told to reset after a dropped
+        connection, since events sent while it was down are lost.
+        """
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                connection = self._engine.raw_connection()
+                connection.detach()  # LISTEN state must not go back to the pool
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                dbapi_connection.cursor().execute(f"LISTEN {STREAM_CHANNEL}")
+                while not self._stopping.is_set():
+                    if not select.select([dbapi_connection], [], [], 1.0)[0]:
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        self._deliver(dbapi_connection.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"❌ ERROR: Community listener lost its connection: {e!r}")
+                loop = self._loop
+                if loop is not None and not loop.is_closed():
+                    loop.call_soon_threadsafe(self._reset_all)
+                self._stopping.wait(1.0)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def _fan_out(self, message: str):
+        self.published += 1
+        for subscriber in list(self.subscribers):
+            if subscriber.queue.qsize() >= self.queue_size:
+                self.disconnected_slow += 1
+                self._close(subscriber, SLOW_CONSUMER_MESSAGE)
+                continue
+            subscriber.queue.put_nowait(message)
+            self.delivered += 1
+
+    def _reset_all(self):
+        for subscriber in list(self.subscribers):
+            self._close(subscriber, MISSED_UPDATES_MESSAGE)
+
+    def _close(self, subscriber: Subscriber, final_message):
+        """
+        Drops whatever the subscriber hasn't read and leaves it `final_message` plus an end marker.
+        """
+        self.subscribers.discard(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        if final_message:
+            subscriber.queue.put_nowait(final_message)
+        subscriber.queue.put_nowait(None)
+
+    async def stream(self, subscriber: Subscriber, heartbeat: float = STREAM_HEARTBEAT_SECONDS):
+        """
+        Yields SSE text for one subscriber until it is closed or the client goes away.
+        """
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+
+community_hub = CommunityHub()
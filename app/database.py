@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
@@ -25,6 +26,12 @@ def get_db():
     finally:
         db.close()
 
+# INSERT with ON CONFLICT support for the session's database (PostgreSQL, or SQLite locally)
+def dialect_insert(db, table):
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
         
 #  Retrieve Spoonacular API Key
 SPOONACULAR_API_KEY = os.getenv("SPOONACULAR_API_KEY")
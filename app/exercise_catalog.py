@@ -0,0 +1,242 @@
+# app/exercise_catalog.py
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal, dialect_insert
+from app.http_client import http_client
+from app.models import Exercise
+from app.periodic import PeriodicTask
+
+# Load ExerciseDB API key from environment variables
+EXERCISEDB_API_KEY = os.getenv("EXERCISEDB_API_KEY")
+EXERCISEDB_BASE_URL = "https://exercisedb.p.rapidapi.com/exercises"
+
+HEADERS = {
+    "X-RapidAPI-Key": EXERCISEDB_API_KEY,
+    "X-RapidAPI-Host": "exercisedb.p.rapidapi.com"
+}
+# Exercises requested per call when downloading the full catalog
+EXERCISEDB_PAGE_SIZE = int(os.getenv("EXERCISEDB_PAGE_SIZE", "500"))
+# Re-download the catalog once the snapshot is this old (seconds)
+EXERCISE_SYNC_INTERVAL = float(os.getenv("EXERCISE_SYNC_INTERVAL", str(24 * 3600)))
+# Seconds between each worker's check of the snapshot table for changes
+EXERCISE_REFRESH_INTERVAL = float(os.getenv("EXERCISE_REFRESH_INTERVAL", "600"))
+
+SNAPSHOT_FIELDS = ("name", "body_part", "equipment", "target", "gif_url", "instructions")
+NO_MATCHES = ((), frozenset())
+
+
+def index_key(value: str) -> str:
+    return (value or "").strip().lower()
+
+
+def snapshot_row(exercise: dict) -> dict:
+    """
+    ExerciseDB JSON -> exercises table columns.
+    """
+    return {
+        "id": str(exercise["id"]),
+        "name": exercise["name"],
+        "body_part": exercise["bodyPart"],
+        "equipment": exercise["equipment"],
+        "target": exercise["target"],
+        "gif_url": exercise.get("gifUrl"),
+        "instructions": exercise.get("instructions", []),
+    }
+
+
+def api_exercise(row) -> dict:
+    """
+    exercises table row -> the ExerciseDB JSON shape get_workouts works with.
+    """
+    return {
+        "id": row.id,
+        "name": row.name,
+        "bodyPart": row.body_part,
+        "equipment": row.equipment,
+        "target": row.target,
+        "gifUrl": row.gif_url,
+        "instructions": row.instructions or [],
+    }
+
+
+async def download_catalog() -> list:
+    """
+    Every exercise in ExerciseDB, fetched EXERCISEDB_PAGE_SIZE at a time.
+    Raises httpx.HTTPError if a page can't be fetched.
+    """
+    exercises, offset = [], 0
+    while True:
+        response = await http_client.get(
+            f"{EXERCISEDB_BASE_URL}?limit={EXERCISEDB_PAGE_SIZE}&offset={offset}", headers=HEADERS,
+        )
+        response.raise_for_status()
+        page = response.json()
+        exercises.extend(page)
+        if len(page) < EXERCISEDB_PAGE_SIZE:
+            return exercises
+        offset += len(page)
+
+
+def store_snapshot(db: Session, exercises: list):
+    """
+    Writes a full download into the exercises table: new and changed exercises in one upsert
+    (with updated_at bumped), ones no longer upstream deleted, and synced_at set on the rest.
+    Returns (changed, removed) counts.
+    """
+    now = datetime.utcnow()
+    rows = {row["id"]: row for row in map(snapshot_row, exercises)}
+    if not rows:
+        print(" ExerciseDB returned no exercises; keeping the current snapshot")
+        return 0, 0
+
+    existing = {
+        row.id: tuple(row[1:])
+        for row in db.query(Exercise.id, *(getattr(Exercise, field) for field in SNAPSHOT_FIELDS))
+    }
+    changed = [
+        {**row, "updated_at": now, "synced_at": now}
+        for exercise_id, row in rows.items()
+        if existing.get(exercise_id) != tuple(row[field] for field in SNAPSHOT_FIELDS)
+    ]
+    removed = existing.keys() - rows.keys()
+
+    if changed:
+        insert = dialect_insert(db, Exercise.__table__).values(changed)
+        db.execute(insert.on_conflict_do_update(
+            index_elements=["id"],
+            set_={column: insert.excluded[column] for column in (*SNAPSHOT_FIELDS, "updated_at", "synced_at")},
+        ))
+    if removed:
+        db.query(Exercise).filter(Exercise.id.in_(removed)).delete(synchronize_session=False)
+    db.query(Exercise).update({Exercise.synced_at: now}, synchronize_session=False)
+    db.commit()
+    return len(changed), len(removed)
+
+
+class ExerciseCatalog:
+    """
+    In-memory copy of the exercises snapshot, indexed by bodyPart, equipment and target
+    (lower-cased), so /workouts never waits on ExerciseDB. Loaded at startup; a background
+    task applies changes from the table every EXERCISE_REFRESH_INTERVAL (only rows whose
+    updated_at moved are read) and re-downloads the catalog once the snapshot is older than
+    EXERCISE_SYNC_INTERVAL. Indexes are rebuilt off to the side and swapped in whole, so
+    readers never see a half-applied refresh. Each worker process holds its own copy.
+    """
+
+    def __init__(self):
+        # (by_id, by_body_part, by_equipment, by_target), replaced together
+        self._indexes = ({}, {}, {}, {})
+        self.version = None  # Newest updated_at loaded
+        self.synced_at = None
+        self.refreshes = 0
+        self._task = PeriodicTask("Exercise catalog refresh", self.refresh, EXERCISE_REFRESH_INTERVAL)
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._indexes[0])
+
+    def __len__(self):
+        return len(self._indexes[0])
+
+    def exercises(self, body_part: str = None, equipment: str = None, target_contains: str = None) -> list:
+        """
+        Exercises matching every given filter (exact bodyPart / equipment, substring of target), in id order.
+        """
+        by_id, by_body_part, by_equipment, by_target = self._indexes
+        filters = []  # One (exercises in id order, their ids) per filter
+        if body_part is not None:
+            filters.append(by_body_part.get(index_key(body_part), NO_MATCHES))
+        if equipment is not None:
+            filters.append(by_equipment.get(index_key(equipment), NO_MATCHES))
+        if target_contains is not None:
+            term = index_key(target_contains)
+            groups = [group for target, group in by_target.items() if term in target]
+            if len(groups) == 1:
+                filters.append(groups[0])
+            else:
+                merged = sorted((exercise for group, _ in groups for exercise in group), key=lambda exercise: exercise["id"])
+                filters.append((merged, {exercise["id"] for exercise in merged}))
+        if not filters:
+            return list(by_id.values())
+
+        # Walk the smallest match list, keeping what the other filters' id sets contain
+        filters.sort(key=lambda matches: len(matches[0]))
+        exercises = filters[0][0]
+        for _, ids in filters[1:]:
+            exercises = [exercise for exercise in exercises if exercise["id"] in ids]
+        return list(exercises)
+
+    def load(self, db: Session):
+        """
+        Rebuilds the indexes from the whole table.
+        """
+        self.version = None
+        self.apply_changes(db)
+
+    def apply_changes(self, db: Session) -> int:
+        """
+        Brings the indexes up to date with the table, reading only rows changed since the last
+        load (plus the id list if something was deleted). Returns how many exercises changed.
+        """
+        version, synced_at, count = db.query(
+            func.max(Exercise.updated_at), func.max(Exercise.synced_at), func.count(Exercise.id),
+        ).one()
+        self.synced_at = synced_at
+        by_id = self._indexes[0]
+        if version == self.version and count == len(by_id):
+            return 0
+
+        query = db.query(Exercise)
+        if self.version is not None:
+            query = query.filter(Exercise.updated_at > self.version)
+        changed = {row.id: api_exercise(row) for row in query}
+
+        exercises = {**by_id, **changed}
+        if len(exercises) != count:
+            current = {exercise_id for exercise_id, in db.query(Exercise.id)}
+            exercises = {exercise_id: exercise for exercise_id, exercise in exercises.items() if exercise_id in current}
+
+        self._index(exercises)
+        self.version = version
+        print(f" Exercise catalog: {len(exercises)} exercises ({len(changed)} loaded)")
+        return len(changed)
+
+    def _index(self, exercises: dict):
+        by_id, by_body_part, by_equipment, by_target = {}, {}, {}, {}
+        for exercise_id in sorted(exercises):
+            exercise = exercises[exercise_id]
+            by_id[exercise_id] = exercise
+            for index, field in ((by_body_part, "bodyPart"), (by_equipment, "equipment"), (by_target, "target")):
+                group, ids = index.setdefault(index_key(exercise[field]), ([], set()))
+                group.append(exercise)
+                ids.add(exercise_id)
+        self._indexes = (by_id, by_body_part, by_equipment, by_target)
+
+    async def refresh(self):
+        """
+        Re-downloads the catalog if the snapshot is stale, then applies table changes to memory.
+        """
+        db = SessionLocal()
+        try:
+            last_sync = await run_in_threadpool(lambda: db.query(func.max(Exercise.synced_at)).scalar())
+            if last_sync is None or datetime.utcnow() - last_sync >= timedelta(seconds=EXERCISE_SYNC_INTERVAL):
+                exercises = await download_catalog()
+                changed, removed = await run_in_threadpool(store_snapshot, db, exercises)
+                print(f" Synced ExerciseDB: {changed} new or changed, {removed} removed")
+            await run_in_threadpool(self.apply_changes, db)
+            self.refreshes += 1
+        finally:
+            await run_in_threadpool(db.close)
+
+    def start(self):
+        if EXERCISEDB_API_KEY:
+            self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+
+exercise_catalog = ExerciseCatalog()
@@ -0,0 +1,90 @@
+# app/feed_cache.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from app.database import dialect_insert
+from app.models import FeedVersion
+
+# Rendered feed pages kept per process (least recently used pages are dropped first)
+FEED_CACHE_MAX_PAGES = int(os.getenv("FEED_CACHE_MAX_PAGES", "256"))
+
+
+class FeedCache:
+    """
+    Rendered /community/posts pages keyed by (cursor, limit), all tied to one version counter.
+    The counter lives in the feed_version table: anything that changes what the feed shows
+    calls `bump(db)` in the transaction making the change, so a write handled by any worker
+    process invalidates every process's pages and changes the ETag once it commits.
+    """
+
+    def __init__(self, max_pages: int = FEED_CACHE_MAX_PAGES):
+        self.max_pages = max_pages
+        self.latest = 0  # Newest version this process has seen
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()  # (cursor, limit) -> (version, body, next_cursor)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag(cursor: str, limit: int, version: int) -> str:
+        """
+        Weak ETag for one page at `version`; differs per (cursor, limit) so pages don't validate each other.
+        """
+        page_key = hashlib.sha1(f"{cursor or ''}:{limit}".encode()).hexdigest()[:16]
+        return f'W/"feed-{version}-{page_key}"'
+
+    @staticmethod
+    def version(db: Session) -> int:
+        """
+        The committed feed version (one primary-key read).
+        """
+        return db.query(FeedVersion.version).filter(FeedVersion.id == 1).scalar() or 0
+
+    @staticmethod
+    def bump(db: Session) -> int:
+        """
+        Moves the feed version on in the caller's transaction (caller commits); returns the new version.
+        The row lock is held until commit, so call it just before committing.
+        """
+        table = FeedVersion.__table__
+        insert = dialect_insert(db, table).values(id=1, version=1)
+        return db.execute(insert.on_conflict_do_update(
+            index_elements=["id"], set_={"version": table.c.version + 1},
+        ).returning(table.c.version)).scalar_one()
+
+    def get(self, cursor: str, limit: int, version: int):
+        """
+        Returns (body, next_cursor) for a page rendered at `version`, or None.
+        """
+        key = (cursor, limit)
+        with self._lock:
+            self._observe(version)
+            page = self._pages.get(key)
+            if page is None or page[0] != version:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page[1], page[2]
+
+    def put(self, cursor: str, limit: int, version: int, body: bytes, next_cursor: str):
+        """
+        Stores a page rendered at `version`; dropped if a newer version has been seen meanwhile.
+        """
+        with self._lock:
+            if version != self.latest:
+                return
+            self._pages[(cursor, limit)] = (version, body, next_cursor)
+            self._pages.move_to_end((cursor, limit))
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def _observe(self, version: int):
+        if version > self.latest:
+            self.latest = version
+            self._pages.clear()
+
+
+feed_cache = FeedCache()
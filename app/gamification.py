@@ -1,35 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from app.database import get_db
-from app.models import Streak, Achievement, Badge, User, ActivityLog
+from datetime import datetime, timedelta, timezone
+from app.achievement_catalog import catalog
+from app.achievement_rules import ACTIVITY_TYPES, RULES
+from app.badge_queue import BadgeQueue
+from app.database import SessionLocal, dialect_insert, get_db
+from app.http_cache import etag_matches, not_modified
+from app.leaderboard import WINDOWS, leaderboard
+from app.models import Streak, Badge, BadgeOutbox, User, ActivityLog, UserActivityStats
 from pydantic import BaseModel
-from sqlalchemy import extract, func
+from sqlalchemy import case, func, insert, or_, update
 
 router = APIRouter()
 
+# Hour boundaries (UTC) for the Early Riser / Night Owl counters
+EARLY_HOUR = 6
+LATE_HOUR = 22
+# Seconds a processed badge event stays in the outbox for /badge-events polling
+BADGE_EVENT_TTL = int(os.getenv("BADGE_EVENT_TTL", "86400"))
+
 class AchievementResponse(BaseModel):
     id: int
     name: str
     fa_icon_class: str
 
 @router.get("/all-achievements", response_model=list[AchievementResponse])
-def get_all_achievements(db: Session = Depends(get_db)):
+def get_all_achievements(request: Request, db: Session = Depends(get_db)):
     """
     Fetches all achievements (both unlocked & locked).
     Used to display locked badges in the UI.
+    Served from the in-process catalog; answers 304 when the client's ETag is current.
     """
-    achievements = db.query(Achievement).all()
+    achievements = catalog.get(db)
 
-    return [
-        {
-            "id": ach.id,
-            "name": ach.name,
-            #  Remove "fas " prefix before sending to frontend
-            "fa_icon_class": ach.fa_icon_class.replace("fas ", "").strip() if ach.fa_icon_class and "fa-" in ach.fa_icon_class else "question-circle"
-        }
-        for ach in achievements
-    ]
+    if etag_matches(request, achievements.etag):
+        return not_modified(achievements.etag)
+
+    return JSONResponse(content=achievements.entries, headers={"ETag": achievements.etag})
+
+
+@router.post("/achievements/reload")
+def reload_achievements(db: Session = Depends(get_db)):
+    """
+    Drops the cached achievement catalog and reloads it (call after editing the achievements table).
+    """
+    catalog.invalidate()
+    achievements = catalog.get(db)
+    return {"message": "Achievement catalog reloaded", "count": len(achievements.entries)}
 
 
 @router.get("/user-progress")
@@ -44,17 +64,22 @@ def get_user_progress(user_id: int, db: Session = Depends(get_db)):
     # Fetch all streaks for the user
     streaks = db.query(Streak).filter(Streak.user_id == user_id).all()
 
-    # Fetch total logs for workout and meal
-    total_logs = {
-        "workout": db.query(ActivityLog).filter(ActivityLog.user_id == user_id, ActivityLog.type == "workout").count(),
-        "meal": db.query(ActivityLog).filter(ActivityLog.user_id == user_id, ActivityLog.type == "meal").count(),
-    }
+    # Read total logs from the maintained counters (seeded once for older accounts)
+    stats = {s.type: s for s in db.query(UserActivityStats).filter(UserActivityStats.user_id == user_id).all()}
+    missing = [activity_type for activity_type in ACTIVITY_TYPES if activity_type not in stats]
+    for activity_type in missing:
+        stats[activity_type] = get_activity_stats(user_id, activity_type, db)
 
-    return {
+    progress = {
         "current_streaks": {streak.type: streak.current_streak for streak in streaks},
         "best_streaks": {streak.type: streak.best_streak for streak in streaks},
-        "total_logs": total_logs,
+        "total_logs": {activity_type: stats[activity_type].total_logs for activity_type in ACTIVITY_TYPES},
     }
+    #  The seed is a Core insert (nothing in db.new), so keep it whenever one ran
+    if missing:
+        db.commit()
+
+    return progress
 
 
 @router.get("/badges")
@@ -79,6 +104,55 @@ def get_user_badges(user_id: int, db: Session = Depends(get_db)):
 
 
 
+@router.get("/leaderboard")
+def get_leaderboard(
+    activity_type: str = Query("workout", alias="type", description="Activity type: workout or meal"),
+    window: str = Query("current", description="current (ongoing streaks) or best (all-time best streaks)"),
+    limit: int = Query(10, ge=1, le=100),
+    user_id: int = Query(None, description="Also return this user's rank"),
+    db: Session = Depends(get_db),
+):
+    """
+    Streak leaderboard served from the in-memory ranking (no ORDER BY over streaks).
+    """
+    if activity_type not in ACTIVITY_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid activity type. Use 'workout' or 'meal'.")
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Invalid window. Use one of: {', '.join(WINDOWS)}.")
+
+    ranking = leaderboard.ranking(activity_type, window)
+    top = ranking.top(limit)
+
+    #  One query for the names of the users on this page
+    users = {
+        user.id: user
+        for user in db.query(User).filter(User.id.in_([entry_user_id for _, entry_user_id, _ in top])).all()
+    } if top else {}
+
+    me = None
+    if user_id is not None:
+        position = ranking.rank(user_id)
+        if position:
+            me = {"rank": position[0], "streak": position[1]}
+
+    return {
+        "type": activity_type,
+        "window": window,
+        "total_users": len(ranking),
+        "top": [
+            {
+                "rank": rank,
+                "user_id": entry_user_id,
+                "username": users[entry_user_id].username if entry_user_id in users else None,
+                "profile_picture": users[entry_user_id].profile_picture if entry_user_id in users else None,
+                "streak": streak,
+            }
+            for rank, entry_user_id, streak in top
+        ],
+        "me": me,
+    }
+
+
 class ActivityLogRequest(BaseModel):
     user_id: int
     activity_type: str  # "workout" or "meal"
@@ -86,190 +160,488 @@ class ActivityLogRequest(BaseModel):
 @router.post("/log-activity")
 def log_activity(data: ActivityLogRequest, db: Session = Depends(get_db)):
     """
-    Logs an activity (workout or meal), updates the user's streak, and checks for new badges.
+    Logs an activity (workout or meal) and updates the user's streak.
+    Badge checks are queued and run in the background; poll /badge-events/{badge_event_id} for the result.
     """
 
     #  Step 1: Validate activity type
-    if data.activity_type not in ["workout", "meal"]:
+    if data.activity_type not in ACTIVITY_TYPES:
         raise HTTPException(status_code=400, detail="Invalid activity type. Use 'workout' or 'meal'.")
 
     user = db.query(User).filter(User.id == data.user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    today = datetime.utcnow().date()
+    now = datetime.utcnow()
 
-    #  Step 2: Allow multiple logs but only update streak once per day
-    existing_log = db.query(ActivityLog).filter(
-        ActivityLog.user_id == data.user_id,
-        ActivityLog.type == data.activity_type,
-        func.date(ActivityLog.logged_at) == today
-    ).first()
+    #  Step 2: Make sure the counters exist (seeded once for older accounts)
+    get_activity_stats(data.user_id, data.activity_type, db)
 
-    streak_updated = False
-    if not existing_log:
-        streak_updated = True  #  Streak will update if this is the first log today
+    #  Step 3: Log the activity and bump the counters atomically
+    db.add(ActivityLog(user_id=data.user_id, type=data.activity_type, logged_at=now))
+    total_logs = bump_activity_stats(data.user_id, data.activity_type, now, db)
 
-    #  Step 3: Log the activity
-    new_log = ActivityLog(user_id=data.user_id, type=data.activity_type, logged_at=datetime.utcnow())
-    db.add(new_log)
-    db.commit()
+    #  Step 4: Update the streak in one upsert; it only moves on the first log of a day
+    current_streak, best_streak, streak_updated = upsert_streak(data.user_id, data.activity_type, now, db)
 
-    print(f"Activity logged: {data.activity_type} for user {data.user_id} at {new_log.logged_at}")
+    #  Step 5: Queue the badge check in the same transaction (outbox), then commit everything once
+    badge_event = BadgeOutbox(user_id=data.user_id, activity_type=data.activity_type,
+                              current_streak=current_streak, total_logs=total_logs, status="pending")
+    db.add(badge_event)
+    db.flush()
+    badge_event_id = badge_event.id
+    db.commit()
 
-    #  Step 4: Ensure streak exists before calling `check_and_award_badge()`
-    streak = db.query(Streak).filter(Streak.user_id == data.user_id, Streak.type == data.activity_type).first()
-    
+    print(f"Activity logged: {data.activity_type} for user {data.user_id} at {now}, total {total_logs}")
     if streak_updated:
-        if streak:
-            last_logged_day = streak.last_updated.date() if streak.last_updated else None
-            print(f"🔍 Last logged day: {last_logged_day}, Today: {today}")
+        print(f" Streaks updated: Current: {current_streak}, Best: {best_streak}")
+        leaderboard.record(data.user_id, data.activity_type, current_streak, best_streak, now)
 
-            if last_logged_day == today - timedelta(days=1):  # If logged yesterday, increase streak
-                streak.current_streak += 1
-                print(f" Streak increased! New streak: {streak.current_streak}")
-            elif last_logged_day != today:  # If not logged today and not yesterday, reset streak
-                print(" Missed a day. Resetting streak.")
-                streak.current_streak = 1  # Reset streak
+    badge_queue.submit(badge_event_id, data.user_id)
 
-            streak.best_streak = max(streak.best_streak, streak.current_streak)
-            streak.last_updated = datetime.utcnow()
+    return {
+        "message": "Activity logged successfully",
+        "current_streak": current_streak if streak_updated else None,
+        "best_streak": best_streak if streak_updated else None,
+        "total_logs": total_logs,  #  Ensure total logs are updated in response
+        "badge_event_id": badge_event_id,
+    }
 
-        else:
-            print("🔹 No streak found. Creating new streak entry.")
-            streak = Streak(user_id=data.user_id, type=data.activity_type, current_streak=1, best_streak=1, last_updated=datetime.utcnow())
-            db.add(streak)
 
-        db.commit()
-        print(f" Streaks updated: Current: {streak.current_streak}, Best: {streak.best_streak}")
+@router.get("/badge-events/{event_id}")
+def get_badge_event(event_id: int, db: Session = Depends(get_db)):
+    """
+    Polls the result of a queued badge check (processed events are kept for BADGE_EVENT_TTL seconds).
+    """
+    event = db.get(BadgeOutbox, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Badge event not found")
 
-    #  Step 5: Count total logs for this activity type
-    total_logs = db.query(ActivityLog).filter(
-        ActivityLog.user_id == data.user_id,
-        ActivityLog.type == data.activity_type
-    ).count()
+    return {
+        "id": event.id,
+        "user_id": event.user_id,
+        "status": event.status,
+        "new_badges": json.loads(event.new_badges) if event.new_badges else [],
+        "created_at": event.created_at,
+        "processed_at": event.processed_at,
+    }
 
-    print(f" Total {data.activity_type} logs: {total_logs}")
 
-    #  Step 6: Call badge function only if streak exists
-    check_and_award_badge(data.user_id, data.activity_type, streak.current_streak if streak else None, total_logs, db)
+@router.get("/badge-queue/metrics")
+def get_badge_queue_metrics(db: Session = Depends(get_db)):
+    """
+    Queue depth and lag for the background badge workers.
+    """
+    pending, oldest_pending = db.query(
+        func.count(BadgeOutbox.id), func.min(BadgeOutbox.created_at)
+    ).filter(BadgeOutbox.status == "pending").one()
 
     return {
-        "message": "Activity logged successfully",
-        "current_streak": streak.current_streak if streak_updated else None,
-        "best_streak": streak.best_streak if streak_updated else None,
-        "total_logs": total_logs  #  Ensure total logs are updated in response
+        "workers": badge_queue.workers,
+        "running": badge_queue.running,
+        "queue_depth": badge_queue.depth(),
+        "pending_events": pending,
+        "oldest_pending_seconds": (datetime.utcnow() - oldest_pending).total_seconds() if oldest_pending else 0,
+        "last_lag_seconds": badge_queue.last_lag_seconds,
+        "processed": badge_queue.processed,
+        "failed": badge_queue.failed,
+        "pruned": badge_queue.pruned,
+    }
+
+
+class ActivityEvent(BaseModel):
+    user_id: int
+    activity_type: str  # "workout" or "meal"
+    logged_at: datetime  # When the activity happened on the device
+
+class ActivityBatchRequest(BaseModel):
+    events: list[ActivityEvent]
+
+# Largest backlog accepted in one upload
+MAX_BATCH_EVENTS = 1000
+
+@router.post("/log-activity/batch")
+def log_activity_batch(data: ActivityBatchRequest, db: Session = Depends(get_db)):
+    """
+    Replays a backlog of timestamped activities (e.g. from an offline phone) in time order,
+    updating logs, counters, streaks and badges in a single transaction.
+    """
+
+    #  Step 1: Validate the batch
+    if not data.events:
+        raise HTTPException(status_code=400, detail="No events to log")
+    if len(data.events) > MAX_BATCH_EVENTS:
+        raise HTTPException(status_code=400, detail=f"Too many events. Send at most {MAX_BATCH_EVENTS} per batch.")
+    if any(event.activity_type not in ACTIVITY_TYPES for event in data.events):
+        raise HTTPException(status_code=400, detail="Invalid activity type. Use 'workout' or 'meal'.")
+
+    now = datetime.utcnow()
+    events = []
+    for event in data.events:
+        logged_at = event.logged_at
+        if logged_at.tzinfo:
+            logged_at = logged_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if logged_at > now + timedelta(minutes=5):
+            raise HTTPException(status_code=400, detail="Activity timestamps cannot be in the future")
+        events.append((logged_at, event.user_id, event.activity_type))
+    events.sort(key=lambda event: event[0])
+
+    user_ids = {user_id for _, user_id, _ in events}
+    found = {row.id for row in db.query(User.id).filter(User.id.in_(user_ids)).all()}
+    if found != user_ids:
+        raise HTTPException(status_code=404, detail=f"User not found: {sorted(user_ids - found)}")
+
+    #  Step 2: Make sure counters and streaks exist for every (user, type), then lock them
+    #  so concurrent log_activity calls wait for the replay instead of racing it
+    keys = {(user_id, activity_type) for _, user_id, activity_type in events}
+    for user_id, activity_type in keys:
+        get_activity_stats(user_id, activity_type, db)
+    db.execute(
+        dialect_insert(db, Streak.__table__).values([
+            {"user_id": user_id, "type": activity_type, "current_streak": 0, "best_streak": 0, "last_updated": None}
+            for user_id, activity_type in sorted(keys)
+        ]).on_conflict_do_nothing(index_elements=["user_id", "type"])
+    )
+
+    stats = {
+        (counter.user_id, counter.type): counter
+        for counter in db.query(UserActivityStats).filter(UserActivityStats.user_id.in_(user_ids))
+        .order_by(UserActivityStats.user_id, UserActivityStats.type)
+        .with_for_update().populate_existing().all()
+    }
+    streaks = {
+        (streak.user_id, streak.type): streak
+        for streak in db.query(Streak).filter(Streak.user_id.in_(user_ids))
+        .order_by(Streak.user_id, Streak.type)
+        .with_for_update().populate_existing().all()
+    }
+
+    #  Step 3: Replay the events in time order
+    peak_streaks = {}
+    for logged_at, user_id, activity_type in events:
+        key = (user_id, activity_type)
+        record_activity_stats(stats[key], logged_at)
+
+        streak = streaks[key]
+        advance_streak(streak, logged_at)
+        peak_streaks[key] = max(peak_streaks.get(key, 0), streak.current_streak)
+
+    db.execute(insert(ActivityLog), [
+        {"user_id": user_id, "type": activity_type, "logged_at": logged_at}
+        for logged_at, user_id, activity_type in events
+    ])
+
+    #  Step 4: Badges, judged on the highest streak reached during the replay
+    new_badges = {}
+    for user_id in sorted(user_ids):
+        touched = [activity_type for activity_type in ACTIVITY_TYPES if (user_id, activity_type) in keys]
+        needed = set().union(*(RULES.required_stats(activity_type) for activity_type in touched))
+        needed_types = {stat.partition(".")[0] for stat in needed}
+
+        counters = [get_activity_stats(user_id, activity_type, db) for activity_type in needed_types]
+        user_streaks = {}
+        for activity_type in needed_types:
+            key = (user_id, activity_type)
+            user_streaks[activity_type] = peak_streaks[key] if key in peak_streaks else getattr(streaks.get(key), "current_streak", 0)
+
+        user_stats = rule_stats(counters, user_streaks)
+        qualified = {name for activity_type in touched for name in RULES.evaluate(user_stats, activity_type)}
+        awarded = award_badges(user_id, sorted(qualified), db)
+        if awarded:
+            new_badges[user_id] = awarded
+
+    result = [
+        {
+            "user_id": user_id,
+            "activity_type": activity_type,
+            "current_streak": streaks[(user_id, activity_type)].current_streak,
+            "best_streak": streaks[(user_id, activity_type)].best_streak,
+            "total_logs": stats[(user_id, activity_type)].total_logs,
+        }
+        for user_id, activity_type in sorted(keys)
+    ]
+    last_updated = {key: streak.last_updated for key, streak in streaks.items() if key in keys}
+    db.commit()
+
+    for entry in result:
+        key = (entry["user_id"], entry["activity_type"])
+        leaderboard.record(*key, entry["current_streak"], entry["best_streak"], last_updated[key])
+
+    print(f" Batch logged: {len(events)} activities for {len(user_ids)} users")
+    return {
+        "message": "Activities logged successfully",
+        "logged": len(events),
+        "streaks": result,
+        "new_badges": [{"user_id": user_id, "badges": badges} for user_id, badges in new_badges.items()],
     }
 
+#  Rule stats for one user, shaped the way the achievement rules read them
+def rule_stats(counters: list, streaks: dict) -> dict:
+    """
+    Builds {"<type>.<stat>": value} from UserActivityStats rows and a {type: streak} mapping.
+    """
+    stats = {f"{activity_type}.streak": streak or 0 for activity_type, streak in streaks.items()}
+    for counter in counters:
+        stats[f"{counter.type}.total_logs"] = counter.total_logs
+        stats[f"{counter.type}.early_logs"] = counter.early_logs
+        stats[f"{counter.type}.late_logs"] = counter.late_logs
+    return stats
+
 #  Function to check and award badges
-def check_and_award_badge(user_id: int, activity_type: str, current_streak: int, total_logs: int, db: Session):
+def check_and_award_badge(user_id: int, activity_type: str, current_streak: int, db: Session):
     """
     Checks if a user has reached an achievement milestone and awards a badge if applicable.
+    Only the stats read by rules involving `activity_type` are loaded, in one query per source.
+    Returns the names of the newly awarded badges (caller commits).
     """
+    needed = RULES.required_stats(activity_type)
+    counter_types = {stat.partition(".")[0] for stat in needed if not stat.endswith(".streak")}
+    streak_types = {stat.partition(".")[0] for stat in needed if stat.endswith(".streak")} - {activity_type}
+
+    counters = []
+    if counter_types:
+        counters = db.query(UserActivityStats).filter(
+            UserActivityStats.user_id == user_id,
+            UserActivityStats.type.in_(counter_types)
+        ).all()
+        for missing_type in counter_types - {counter.type for counter in counters}:
+            counters.append(get_activity_stats(user_id, missing_type, db))
+
+    streaks = {activity_type: current_streak}  # Snapshot taken when the activity was logged
+    if streak_types:
+        for streak in db.query(Streak).filter(Streak.user_id == user_id, Streak.type.in_(streak_types)).all():
+            streaks[streak.type] = streak.current_streak
+
+    qualified = RULES.evaluate(rule_stats(counters, streaks), activity_type)
+    return award_badges(user_id, qualified, db)
+
+#  Function to award badges
+def award_badges(user_id: int, badge_names: list, db: Session) -> list:
+    """
+    Awards every badge in `badge_names` the user doesn't already have.
+    Achievements come from the cached catalog; one query loads the user's earned badges
+    and one bulk INSERT ... ON CONFLICT DO NOTHING adds the new ones, so a badge awarded
+    concurrently by another path (batch replay, recompute job, another worker) is skipped.
+    Returns the names of the newly awarded badges (caller commits).
+    """
+    if not badge_names:
+        return []
+
+    #  Find the achievements related to these badges
+    by_name = catalog.get(db).by_name
+    achievements = []
+    for badge_name in badge_names:
+        if badge_name in by_name:
+            achievements.append(by_name[badge_name])
+        else:
+            print(f"⚠️ Achievement '{badge_name}' does not exist. Skipping.")
 
-    milestones = {
-        "workout": {
-            "streaks": {
-                7: "7-Day Workout Streak",
-                14: "14-Day Workout Streak",
-                30: "30-Day Workout Streak",
-                60: "60-Day Workout Streak"
-            },
-            "logs": {
-                1: "First Workout Completed",
-                10: "10 Workouts Completed",
-                25: "25 Workouts Completed",
-                50: "50 Workouts Completed",
-                100: "100 Workouts Completed"
-            }
-        },
-        "meal": {
-            "streaks": {
-                7: "7-Day Meal Logging Streak",
-                14: "14-Day Meal Logging Streak",
-                30: "30-Day Meal Logging Streak",
-                60: "60-Day Meal Logging Streak"
-            },
-            "logs": {
-                1: "First Meal Logged",
-                10: "10 Meals Logged",
-                25: "25 Meals Logged",
-                50: "50 Meals Logged",
-                100: "100 Meals Logged"
-            }
-        }
+    # Check which of them the user already has
+    earned_ids = {
+        row.achievement_id
+        for row in db.query(Badge.achievement_id).filter(Badge.user_id == user_id).all()
+    }
+
+    to_award = [ach for ach in achievements if ach["id"] not in earned_ids]
+    if not to_award:
+        return []
+
+    now = datetime.utcnow()
+    badges = Badge.__table__
+    inserted = {
+        row.achievement_id
+        for row in db.execute(
+            dialect_insert(db, badges)
+            .on_conflict_do_nothing(index_elements=["user_id", "achievement_id"])
+            .returning(badges.c.achievement_id),
+            [{"user_id": user_id, "achievement_id": ach["id"], "date_earned": now} for ach in to_award],
+        )
     }
+    awarded = [ach["name"] for ach in to_award if ach["id"] in inserted]
+    if awarded:
+        print(f"🏅 Awarded {len(awarded)} new badges to user {user_id}: {awarded}")
+    return awarded
 
-    new_badges = []  # Store new badges to add
-
-    #  Check for streak-based achievements
-    for streak_days, badge_name in milestones[activity_type]["streaks"].items():
-        if current_streak == streak_days:
-            print(f" User {user_id} qualifies for streak-based badge: {badge_name}")
-            award_badge(user_id, badge_name, db, new_badges)
-
-    #  Check for log-based achievements
-    for log_count, badge_name in milestones[activity_type]["logs"].items():
-        if total_logs == log_count:
-            print(f" User {user_id} qualifies for log-based badge: {badge_name}")
-            award_badge(user_id, badge_name, db, new_badges)
-
-    #  Check for special achievements
-    if activity_type == "workout":
-        total_meal_logs = db.query(ActivityLog).filter(
-            ActivityLog.user_id == user_id,
-            ActivityLog.type == "meal"
-        ).count()
-
-        if total_logs >= 30 and total_meal_logs >= 30:
-            award_badge(user_id, "Consistency King", db, new_badges)
-        if total_logs >= 50 and total_meal_logs >= 50:
-            award_badge(user_id, "Halfway to Transformation", db, new_badges)
-        if total_logs >= 100 and total_meal_logs >= 100:
-            award_badge(user_id, "Fitness Legend", db, new_badges)
-
-        early_riser_logs = db.query(ActivityLog).filter(
-            ActivityLog.user_id == user_id,
-            ActivityLog.type == "workout",
-            extract('hour', ActivityLog.logged_at) < 6
-        ).count()
-
-        night_owl_logs = db.query(ActivityLog).filter(
-            ActivityLog.user_id == user_id,
-            ActivityLog.type == "workout",
-            extract('hour', ActivityLog.logged_at) >= 22
-        ).count()
-
-        if early_riser_logs >= 10:
-            award_badge(user_id, "Early Riser", db, new_badges)
-        if night_owl_logs >= 10:
-            award_badge(user_id, "Night Owl", db, new_badges)
-
-    #  Commit all new badges at once
-    if new_badges:
-        db.add_all(new_badges)
+
+#  Background handler for one badge_outbox event
+def evaluate_badge_event(event_id: int):
+    """
+    Runs the badge check for a queued event and stores the result, in one transaction.
+    The event is claimed first (pending -> processing), so when two workers or processes
+    pick up the same event only one evaluates it; the other waits on the row lock and then
+    finds it no longer pending. A failure rolls the claim back, leaving the event pending.
+    """
+    db = SessionLocal()
+    try:
+        claimed = db.execute(
+            update(BadgeOutbox)
+            .where(BadgeOutbox.id == event_id, BadgeOutbox.status == "pending")
+            .values(status="processing")
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return
+
+        event = db.get(BadgeOutbox, event_id)
+
+        new_badges = check_and_award_badge(event.user_id, event.activity_type, event.current_streak, db)
+        event.status = "done"
+        event.new_badges = json.dumps(new_badges)
+        event.processed_at = datetime.utcnow()
         db.commit()
-        print(f"🏅 Awarded {len(new_badges)} new badges to user {user_id}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def pending_badge_events(db: Session) -> list:
+    """
+    (event_id, user_id) for every outbox event not yet processed, oldest first.
+    """
+    return db.query(BadgeOutbox.id, BadgeOutbox.user_id).filter(
+        BadgeOutbox.status == "pending"
+    ).order_by(BadgeOutbox.id).all()
+
+
+def prune_badge_events() -> int:
+    """
+    Deletes processed outbox events older than BADGE_EVENT_TTL; returns how many.
+    """
+    db = SessionLocal()
+    try:
+        deleted = db.query(BadgeOutbox).filter(
+            BadgeOutbox.status == "done",
+            BadgeOutbox.created_at < datetime.utcnow() - timedelta(seconds=BADGE_EVENT_TTL),
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
 
-#  Function to award a badge
-def award_badge(user_id: int, badge_name: str, db: Session, new_badges: list):
+badge_queue = BadgeQueue(evaluate_badge_event, pruner=prune_badge_events)
+
+#  Function to load (or seed) the per-user activity counters
+def get_activity_stats(user_id: int, activity_type: str, db: Session) -> UserActivityStats:
+    """
+    Returns the user's counters for an activity type.
+    Accounts that logged before the counters existed are seeded from activity_logs once.
+    """
+    stats = db.get(UserActivityStats, (user_id, activity_type))
+    if stats:
+        return stats
+
+    total, early, late, last_logged_at = db.query(
+        func.count(ActivityLog.id),
+        func.sum(case((ActivityLog.log_hour < EARLY_HOUR, 1), else_=0)),
+        func.sum(case((ActivityLog.log_hour >= LATE_HOUR, 1), else_=0)),
+        func.max(ActivityLog.logged_at),
+    ).filter(
+        ActivityLog.user_id == user_id,
+        ActivityLog.type == activity_type
+    ).one()
+
+    #  A concurrent request may seed the same row; whichever insert lands first wins
+    db.execute(
+        dialect_insert(db, UserActivityStats.__table__).values(
+            user_id=user_id,
+            type=activity_type,
+            total_logs=total or 0,
+            early_logs=early or 0,
+            late_logs=late or 0,
+            last_log_date=last_logged_at.date() if last_logged_at else None,
+        ).on_conflict_do_nothing(index_elements=["user_id", "type"])
+    )
+    return db.get(UserActivityStats, (user_id, activity_type))
+
+#  Function to atomically bump the counters for a new log
+def bump_activity_stats(user_id: int, activity_type: str, logged_at: datetime, db: Session) -> int:
+    """
+    Adds one log to the user's counters in a single UPDATE (no read-modify-write).
+    The counters row must exist (see get_activity_stats). Returns the new total (caller commits).
+    """
+    table = UserActivityStats.__table__
+    day = logged_at.date()
+    return db.execute(
+        update(table)
+        .where(table.c.user_id == user_id, table.c.type == activity_type)
+        .values(
+            total_logs=table.c.total_logs + 1,
+            early_logs=table.c.early_logs + (1 if logged_at.hour < EARLY_HOUR else 0),
+            late_logs=table.c.late_logs + (1 if logged_at.hour >= LATE_HOUR else 0),
+            last_log_date=case(
+                (or_(table.c.last_log_date.is_(None), table.c.last_log_date < day), day),
+                else_=table.c.last_log_date,
+            ),
+        )
+        .returning(table.c.total_logs)
+    ).scalar_one()
+
+#  Function to atomically create or advance a streak
+def upsert_streak(user_id: int, activity_type: str, logged_at: datetime, db: Session):
+    """
+    Creates or advances the user's streak in one INSERT ... ON CONFLICT DO UPDATE,
+    with the day-gap rule evaluated by the database:
+    same day or earlier -> unchanged, the day after -> +1, later -> reset to 1.
+    Returns (current_streak, best_streak, advanced) (caller commits).
+    """
+    table = Streak.__table__
+    day = logged_at.date()
+    last_day = func.date(table.c.last_updated)
+    already_counted = last_day >= day
+    new_current = case(
+        (already_counted, table.c.current_streak),
+        (last_day == day - timedelta(days=1), table.c.current_streak + 1),
+        else_=1,
+    )
+
+    stmt = dialect_insert(db, table).values(
+        user_id=user_id, type=activity_type, current_streak=1, best_streak=1, last_updated=logged_at
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "type"],
+        set_={
+            "current_streak": new_current,
+            "best_streak": case((new_current > table.c.best_streak, new_current), else_=table.c.best_streak),
+            "last_updated": case((already_counted, table.c.last_updated), else_=logged_at),
+        },
+    ).returning(table.c.current_streak, table.c.best_streak, table.c.last_updated)
+
+    current_streak, best_streak, last_updated = db.execute(stmt).one()
+    return current_streak, best_streak, last_updated == logged_at
+
+#  Function to bump the counters for a new log
+def record_activity_stats(stats: UserActivityStats, logged_at: datetime):
+    """
+    Applies a single ActivityLog to the user's counters (caller commits).
+    """
+    stats.total_logs += 1
+    if logged_at.hour < EARLY_HOUR:
+        stats.early_logs += 1
+    elif logged_at.hour >= LATE_HOUR:
+        stats.late_logs += 1
+    if not stats.last_log_date or logged_at.date() > stats.last_log_date:
+        stats.last_log_date = logged_at.date()
+
+#  Function to move a streak forward for a new day's log
+def advance_streak(streak: Streak, logged_at: datetime) -> bool:
     """
-    Awards a badge to a user if they don't already have it.
+    Applies a log on `logged_at`'s day to an existing streak (caller commits).
+    Returns False if that day is already counted; older days are left to the recompute job.
     """
+    day = logged_at.date()
+    last_logged_day = streak.last_updated.date() if streak.last_updated else None
 
-    #  Find the achievement related to this badge
-    achievement = db.query(Achievement).filter(Achievement.name == badge_name).first()
-    if not achievement:
-        print(f"⚠️ Achievement '{badge_name}' does not exist. Skipping.")
-        return  # Skip if the achievement is missing
+    if last_logged_day and day <= last_logged_day:
+        return False
 
-    # Check if the user already has this badge
-    existing_badge = db.query(Badge).filter(
-        Badge.user_id == user_id,
-        Badge.achievement_id == achievement.id
-    ).first()
+    if last_logged_day == day - timedelta(days=1):  # If logged the day before, increase streak
+        streak.current_streak += 1
+    else:  # Missed a day (or first log), reset streak
+        streak.current_streak = 1
 
-    if not existing_badge:
-        #  Add new badge to the list for batch insertion
-        new_badges.append(Badge(user_id=user_id, achievement_id=achievement.id, date_earned=datetime.utcnow()))
-        print(f"🏅 Awarded badge: {badge_name} to user {user_id}")
\ No newline at end of file
+    streak.best_streak = max(streak.best_streak or 0, streak.current_streak)
+    streak.last_updated = logged_at
+    return True
@@ -0,0 +1,22 @@
+# app/http_cache.py
+from fastapi import Request, Response
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Returns True if the request's If-None-Match header already names `etag`.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Builds an empty 304 response carrying the current ETag.
+    """
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,60 @@
+# app/http_client.py
+import asyncio
+import os
+import httpx
+
+# Seconds to wait for a connection / for the whole response
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+# Connection pool shared by every outbound call in this process
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+# Extra attempts for a GET that failed to connect, timed out or got a retryable status
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    One pooled httpx.AsyncClient for calls to Spoonacular and ExerciseDB, opened and
+    closed by the app lifespan. Connections are kept alive between requests, so repeat
+    calls to the same API skip the TCP and TLS handshakes.
+    """
+
+    def __init__(self):
+        self._client = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            )
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, url: str, retries: int = HTTP_RETRIES, **kwargs) -> httpx.Response:
+        """
+        GET with retries and exponential backoff. Started on first use if the lifespan hasn't run
+        (scripts, tests). Raises httpx.HTTPError once the retries are used up.
+        """
+        await self.start()
+        if kwargs.get("headers"):
+            # Like requests, leave out headers whose value is unset (e.g. a missing API key) instead of failing
+            kwargs["headers"] = {name: value for name, value in kwargs["headers"].items() if value is not None}
+        for attempt in range(retries + 1):
+            try:
+                response = await self._client.get(url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    raise
+                print(f" Retrying GET {url.split('?')[0]} after {type(e).__name__} (attempt {attempt + 1}/{retries})")
+            await asyncio.sleep(0.2 * 2 ** attempt)
+
+
+http_client = HttpClient()
@@ -0,0 +1,170 @@
+# app/leaderboard.py
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models import Streak
+from app.periodic import PeriodicTask
+
+# Seconds between rebuilds from the streaks table, which pick up streaks moved by other worker processes
+LEADERBOARD_REFRESH_INTERVAL = float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", "60"))
+
+# "current" ranks by current_streak (streaks still alive: last moved today or yesterday), "best" by best_streak
+WINDOWS = ["current", "best"]
+
+
+def current_cutoff() -> date:
+    """
+    Earliest UTC day a streak can have last moved on and still be running.
+    """
+    return datetime.utcnow().date() - timedelta(days=1)
+
+
+class StreakRanking:
+    """
+    Users ordered by streak (highest first, ties broken by user id).
+    Rank and top-N lookups are binary searches over a sorted key list.
+    When fed the day each streak last moved, expire() drops the ones that have lapsed.
+    """
+
+    def __init__(self):
+        self._keys = []  # Sorted (-streak, user_id)
+        self._streaks = {}  # user_id -> streak
+        self._days = {}  # user_id -> UTC day the streak last moved, if tracked
+        self._cutoff = None  # Streaks that last moved before this day have been dropped
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def load(self, streaks: dict, days: dict = None, cutoff: date = None):
+        """
+        Replaces the ranking with `{user_id: streak}` in one sort, optionally with the
+        `{user_id: day}` each streak last moved and the cutoff they were filtered by.
+        """
+        keys = sorted((-streak, user_id) for user_id, streak in streaks.items())
+        with self._lock:
+            self._keys = keys
+            self._streaks = dict(streaks)
+            self._days = dict(days or {})
+            self._cutoff = cutoff
+
+    def update(self, user_id: int, streak: int, day: date = None):
+        with self._lock:
+            if day is not None:
+                if self._cutoff is not None and day < self._cutoff:
+                    return
+                self._days[user_id] = day
+            old = self._streaks.get(user_id)
+            if old == streak:
+                return
+            if old is not None:
+                del self._keys[bisect_left(self._keys, (-old, user_id))]
+            insort(self._keys, (-streak, user_id))
+            self._streaks[user_id] = streak
+
+    def top(self, n: int) -> list:
+        """
+        Returns [(rank, user_id, streak)] for the first n users; tied streaks share a rank.
+        """
+        with self._lock:
+            keys = self._keys[:n]
+            return [(bisect_left(self._keys, (neg_streak,)) + 1, user_id, -neg_streak) for neg_streak, user_id in keys]
+
+    def rank(self, user_id: int):
+        """
+        Returns (rank, streak) for the user, or None if they have no streak of this type.
+        """
+        with self._lock:
+            streak = self._streaks.get(user_id)
+            if streak is None:
+                return None
+            return bisect_left(self._keys, (-streak,)) + 1, streak
+
+    def expire(self, cutoff: date):
+        """
+        Drops users whose streak last moved before `cutoff`. Lapsing only happens at a UTC day
+        boundary, so the full pass runs once per new cutoff; other calls return straight away.
+        """
+        with self._lock:
+            if self._cutoff is not None and cutoff <= self._cutoff:
+                return
+            self._cutoff = cutoff
+            lapsed = {user_id for user_id, day in self._days.items() if day < cutoff}
+            if not lapsed:
+                return
+            self._keys = [key for key in self._keys if key[1] not in lapsed]
+            for user_id in lapsed:
+                del self._streaks[user_id]
+                del self._days[user_id]
+
+
+class Leaderboard:
+    """
+    One StreakRanking per (activity type, window), updated straight away for streaks this
+    process moves and rebuilt from the streaks table at startup and then every
+    LEADERBOARD_REFRESH_INTERVAL, so streaks moved by other worker processes (or the
+    recompute job) show up within one interval. The "current" rankings leave out streaks
+    that have lapsed (no log yesterday or today), even though the stored current_streak is
+    only reset on the user's next log.
+    """
+
+    def __init__(self):
+        self.rankings = {}
+        self._task = PeriodicTask(
+            "Leaderboard refresh", lambda: run_in_threadpool(self.refresh), LEADERBOARD_REFRESH_INTERVAL, wait_first=True,
+        )
+
+    def ranking(self, activity_type: str, window: str) -> StreakRanking:
+        ranking = self.rankings.setdefault((activity_type, window), StreakRanking())
+        if window == "current":
+            ranking.expire(current_cutoff())
+        return ranking
+
+    def rebuild(self, db: Session):
+        streaks, running = self._load(db)
+        print(f" Leaderboard rebuilt: {streaks} streaks, {running} running")
+
+    def _load(self, db: Session):
+        """
+        Replaces every ranking from the streaks table; returns (streaks, running streaks) loaded.
+        """
+        cutoff = current_cutoff()
+        current, days, best = {}, {}, {}
+        for user_id, activity_type, current_streak, best_streak, last_updated in db.query(
+            Streak.user_id, Streak.type, Streak.current_streak, Streak.best_streak, Streak.last_updated
+        ):
+            best.setdefault(activity_type, {})[user_id] = best_streak or 0
+            if last_updated is not None and last_updated.date() >= cutoff:
+                current.setdefault(activity_type, {})[user_id] = current_streak or 0
+                days.setdefault(activity_type, {})[user_id] = last_updated.date()
+
+        for activity_type, streaks in best.items():
+            self.rankings.setdefault((activity_type, "best"), StreakRanking()).load(streaks)
+            self.rankings.setdefault((activity_type, "current"), StreakRanking()).load(
+                current.get(activity_type, {}), days.get(activity_type), cutoff,
+            )
+        return sum(map(len, best.values())), sum(map(len, current.values()))
+
+    def record(self, user_id: int, activity_type: str, current_streak: int, best_streak: int, last_updated: datetime):
+        self.ranking(activity_type, "current").update(user_id, current_streak, last_updated.date())
+        self.ranking(activity_type, "best").update(user_id, best_streak)
+
+    def refresh(self):
+        db = SessionLocal()
+        try:
+            self._load(db)
+        finally:
+            db.close()
+
+    def start(self):
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+
+leaderboard = Leaderboard()
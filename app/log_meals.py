@@ -1,12 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from datetime import datetime  #  Import datetime for timestamps
-from app.database import get_db
+from datetime import date, datetime, time, timedelta, timezone  #  Import datetime for timestamps
+from typing import Optional
+from app.database import SessionLocal, dialect_insert, get_db
+from app.pagination import decode_cursor, encode_cursor
 from app import models, schemas
+import csv
+import io
+import json
 import traceback
 
 router = APIRouter(prefix="/log-meals", tags=["log-meals"], include_in_schema=True)
 
+# Days a summary covers when `from` isn't given, and the longest range it may span
+SUMMARY_DEFAULT_DAYS = 7
+SUMMARY_MAX_DAYS = 366
+# daily_nutrition columns each logged meal adds to
+ROLLUP_COLUMNS = ("calories", "protein", "carbs", "fats", "meal_count")
+# Entries accepted by one /log-meals/batch request
+MAX_BATCH_ENTRIES = 200
+LOG_PAGE_SIZE = 50
+MAX_LOG_PAGE_SIZE = 200
+# Rows fetched per round trip from the export's server-side cursor (and sent per chunk)
+EXPORT_CHUNK_ROWS = 1000
+EXPORT_COLUMNS = ("id", "food_item", "calories", "protein", "carbs", "fats", "timestamp")
+
+
+def add_to_daily_nutrition(db: Session, meals: list):
+    """
+    Adds logged meals (mappings with user_id, timestamp and the four nutrition values) to the
+    daily_nutrition rollup: totals are summed per (user, day) here and written in one
+    multi-row upsert. The caller commits.
+    """
+    totals = {}
+    for meal in meals:
+        day = totals.setdefault((meal["user_id"], meal["timestamp"].date()), dict.fromkeys(ROLLUP_COLUMNS, 0))
+        for column in ("calories", "protein", "carbs", "fats"):
+            day[column] += meal[column]
+        day["meal_count"] += 1
+    if not totals:
+        return
+
+    rollup = models.DailyNutrition.__table__
+    insert = dialect_insert(db, rollup).values([
+        {"user_id": user_id, "day": day, **values} for (user_id, day), values in totals.items()
+    ])
+    db.execute(insert.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={column: rollup.c[column] + insert.excluded[column] for column in ROLLUP_COLUMNS},
+    ))
+
+
 @router.post("/", response_model=schemas.LoggedMealResponse)
 def log_meal(request: schemas.LoggedMealRequest, db: Session = Depends(get_db)):
     """
@@ -26,6 +73,7 @@ def log_meal(request: schemas.LoggedMealRequest, db: Session = Depends(get_db)):
         )
 
         db.add(new_log)
+        add_to_daily_nutrition(db, [{**request.dict(), "timestamp": new_log.timestamp}])
         db.commit()
         db.refresh(new_log)
 
@@ -39,18 +87,218 @@ def log_meal(request: schemas.LoggedMealRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to log meal: {str(e)}")
 
 
+@router.post("/batch", response_model=list[schemas.LoggedMealResponse])
+def log_meals_batch(request: schemas.LoggedMealBatchRequest, db: Session = Depends(get_db)):
+    """
+    Logs several meals for a user in one multi-row INSERT and one rollup upsert.
+    Each entry carries a client_key; entries whose key was already logged for this user are
+    skipped, so a retried upload doesn't duplicate anything. Returns the logged row for every
+    entry in request order, whether it was created now or by an earlier attempt.
+    """
+    if not request.entries:
+        raise HTTPException(status_code=400, detail="No entries to log")
+    if len(request.entries) > MAX_BATCH_ENTRIES:
+        raise HTTPException(status_code=400, detail=f"A batch is limited to {MAX_BATCH_ENTRIES} entries")
+    print(f" Received batch of {len(request.entries)} meals for user {request.user_id}")
+
+    #  Step 1: Insert every entry not logged before
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": request.user_id,
+            "client_key": entry.client_key,
+            "food_item": entry.food_item,
+            "calories": entry.calories,
+            "protein": entry.protein,
+            "carbs": entry.carbs,
+            "fats": entry.fats,
+            "timestamp": utc_naive(entry.timestamp) if entry.timestamp else now,
+        }
+        for entry in request.entries
+    ]
+    meal_table = models.LoggedMeal.__table__
+    try:
+        created_keys = set(db.execute(
+            dialect_insert(db, meal_table).values(rows)
+            .on_conflict_do_nothing(index_elements=["user_id", "client_key"])
+            .returning(meal_table.c.client_key)
+        ).scalars())
+
+        #  Step 2: Add only the new rows to the daily rollup (the first row wins for a key repeated in the batch)
+        new_rows = []
+        for row in rows:
+            if row["client_key"] in created_keys:
+                created_keys.discard(row["client_key"])
+                new_rows.append(row)
+        add_to_daily_nutrition(db, new_rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="User not found")
+
+    #  Step 3: Return the stored rows in request order
+    keys = [entry.client_key for entry in request.entries]
+    stored = {
+        meal.client_key: meal
+        for meal in db.query(models.LoggedMeal).filter(
+            models.LoggedMeal.user_id == request.user_id,
+            models.LoggedMeal.client_key.in_(keys),
+        )
+    }
+    print(f" Logged {len(new_rows)} new meals ({len(rows) - len(new_rows)} already logged) for user {request.user_id}")
+    return [stored[key] for key in keys]
+
+
+def utc_naive(timestamp: datetime) -> datetime:
+    """
+    Client timestamps may carry an offset; logged_meals stores naive UTC.
+    """
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/{user_id}/summary", response_model=schemas.NutritionSummaryResponse)
+def get_nutrition_summary(
+    user_id: int,
+    from_day: date = Query(None, alias="from", description="First UTC day (default: 6 days before `to`)"),
+    to_day: date = Query(None, alias="to", description="Last UTC day (default: today)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Daily calories, macros and meal counts for a date range, read from the daily_nutrition rollup.
+    """
+    end = to_day or datetime.utcnow().date()
+    start = from_day or end - timedelta(days=SUMMARY_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="`from` must not be after `to`")
+    if (end - start).days >= SUMMARY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {SUMMARY_MAX_DAYS} days")
+
+    days = db.query(models.DailyNutrition).filter(
+        models.DailyNutrition.user_id == user_id,
+        models.DailyNutrition.day >= start,
+        models.DailyNutrition.day <= end,
+    ).order_by(models.DailyNutrition.day).all()
+
+    totals = schemas.NutritionTotals(
+        calories=sum(day.calories for day in days),
+        protein=sum(day.protein for day in days),
+        carbs=sum(day.carbs for day in days),
+        fats=sum(day.fats for day in days),
+        meal_count=sum(day.meal_count for day in days),
+    )
+    return {"user_id": user_id, "start": start, "end": end, "days": days, "totals": totals}
+
+
+@router.get("/{user_id}/export")
+def export_logged_meals(
+    user_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    from_day: date = Query(None, alias="from", description="First UTC day to include"),
+    to_day: date = Query(None, alias="to", description="Last UTC day to include"),
+):
+    """
+    Streams a user's meal history oldest first as NDJSON or CSV. Rows come from a server-side
+    cursor and are sent in chunks, so the full history is never held in memory.
+    """
+    if from_day and to_day and from_day > to_day:
+        raise HTTPException(status_code=400, detail="`from` must not be after `to`")
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        export_rows(user_id, format, from_day, to_day),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="meals-{user_id}.{format}"'},
+    )
+
+
+def export_rows(user_id: int, format: str, from_day, to_day):
+    """
+    Yields the export body. Opens its own session: the request's one is closed once the response starts.
+    """
+    db = SessionLocal()
+    try:
+        query = in_date_range(db.query(
+            models.LoggedMeal.id,
+            models.LoggedMeal.food_item,
+            models.LoggedMeal.calories,
+            models.LoggedMeal.protein,
+            models.LoggedMeal.carbs,
+            models.LoggedMeal.fats,
+            models.LoggedMeal.timestamp,
+        ).filter(models.LoggedMeal.user_id == user_id), from_day, to_day).order_by(
+            models.LoggedMeal.timestamp, models.LoggedMeal.id
+        )
+        result = db.execute(query.statement, execution_options={"stream_results": True, "yield_per": EXPORT_CHUNK_ROWS})
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if format == "csv" else None
+        if writer:
+            writer.writerow(EXPORT_COLUMNS)
+
+        for rows in result.partitions():
+            for row in rows:
+                if writer:
+                    writer.writerow([row.id, row.food_item, row.calories, row.protein, row.carbs, row.fats,
+                                     row.timestamp.isoformat() if row.timestamp else ""])
+                else:
+                    record = dict(row._mapping)
+                    record["timestamp"] = row.timestamp.isoformat() if row.timestamp else None
+                    buffer.write(json.dumps(record) + "\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # CSV header of an empty export
+    finally:
+        db.close()
+
+
+def in_date_range(query, from_day, to_day):
+    """
+    Limits a LoggedMeal query to UTC days from_day..to_day (both inclusive, either optional).
+    """
+    if from_day and to_day and from_day > to_day:
+        raise HTTPException(status_code=400, detail="`from` must not be after `to`")
+    if from_day:
+        query = query.filter(models.LoggedMeal.timestamp >= datetime.combine(from_day, time.min))
+    if to_day:
+        query = query.filter(models.LoggedMeal.timestamp < datetime.combine(to_day + timedelta(days=1), time.min))
+    return query
+
+
 @router.get("/{user_id}", response_model=list[schemas.LoggedMealResponse])
-def get_logged_meals(user_id: int, db: Session = Depends(get_db)):
+def get_logged_meals(
+    user_id: int,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: int = Query(LOG_PAGE_SIZE, ge=1, le=MAX_LOG_PAGE_SIZE),
+    from_day: date = Query(None, alias="from", description="First UTC day to include"),
+    to_day: date = Query(None, alias="to", description="Last UTC day to include"),
+    db: Session = Depends(get_db),
+):
     """
-    Fetch all logged meals for a specific user.
+    A user's logged meals, newest first, one page at a time (optionally within a date range).
+    The cursor for the next page is returned in the X-Next-Cursor header (absent on the last page).
     """
     print(f" Fetching logged meals for user {user_id}")
 
-    logged_meals = db.query(models.LoggedMeal).filter(models.LoggedMeal.user_id == user_id).all()
+    query = in_date_range(
+        db.query(models.LoggedMeal).filter(models.LoggedMeal.user_id == user_id), from_day, to_day,
+    ).order_by(models.LoggedMeal.timestamp.desc(), models.LoggedMeal.id.desc())
+    if cursor:
+        timestamp, meal_id = decode_cursor(cursor)
+        query = query.filter(tuple_(models.LoggedMeal.timestamp, models.LoggedMeal.id) < tuple_(timestamp, meal_id))
 
-    if not logged_meals:
+    logged_meals = query.limit(limit + 1).all()
+
+    if not logged_meals and not cursor:
         print(f" No logged meals found for user {user_id}")
         raise HTTPException(status_code=404, detail="No logged meals found")
 
+    if len(logged_meals) > limit:
+        logged_meals = logged_meals[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(logged_meals[-1].timestamp, logged_meals[-1].id)
+
     print(f" Found {len(logged_meals)} logged meals for user {user_id}")
-    return logged_meals 
\ No newline at end of file
+    return logged_meals
@@ -0,0 +1,112 @@
+# app/meal_prefetcher.py
+import os
+from datetime import datetime, timedelta
+import httpx
+from starlette.concurrency import run_in_threadpool
+from app import meals, models
+from app.database import SessionLocal
+from app.http_client import http_client
+from app.periodic import PeriodicTask
+
+# Goals and dietary filters the pool is kept topped up for
+MEAL_GOALS = ("lose weight", "muscle gain", "maintenance")
+DIET_FILTERS = ("", "vegan", "vegetarian", "gluten-free", "diabetic", "low-carb", "keto")
+# Meals each (goal, filter) pool should hold
+MEAL_POOL_TARGET = int(os.getenv("MEAL_POOL_TARGET", "30"))
+# Seconds between top-up rounds
+MEAL_PREFETCH_INTERVAL = float(os.getenv("MEAL_PREFETCH_INTERVAL", "900"))
+
+
+class MealPrefetcher:
+    """
+    Background task keeping a fresh pool of meals for every goal x dietary filter,
+    within the shared daily Spoonacular budget.
+    """
+
+    def __init__(self):
+        self.rounds = 0
+        self.pages_fetched = 0
+        self._task = PeriodicTask("Meal prefetch round", self.top_up, MEAL_PREFETCH_INTERVAL)
+
+    def start(self):
+        if meals.SPOONACULAR_API_KEY:
+            self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+    async def top_up(self):
+        """
+        One round over every pool; returns how many pages were fetched.
+        """
+        db = SessionLocal()
+        fetched = 0
+        try:
+            pools = await run_in_threadpool(self.pool_sizes, db)
+            for size, goal, diet_filter in pools:
+                expiring, missing = await run_in_threadpool(self.pages_to_fetch, goal, diet_filter, db)
+                for offset_bucket in expiring + missing:
+                    if offset_bucket in missing and size >= MEAL_POOL_TARGET:
+                        break
+                    if not await run_in_threadpool(meals.record_spoonacular_request, db, meals.SPOONACULAR_DAILY_BUDGET):
+                        print(f" Meal prefetch stopped: daily budget of {meals.SPOONACULAR_DAILY_BUDGET} requests used")
+                        return fetched
+                    if not await self.fetch_page(goal, diet_filter, offset_bucket, db):
+                        return fetched
+                    fetched += 1
+                    size = await run_in_threadpool(meals.pool_size, goal, diet_filter, db)
+        finally:
+            await run_in_threadpool(db.close)
+            self.rounds += 1
+            self.pages_fetched += fetched
+        if fetched:
+            print(f" Meal prefetch fetched {fetched} pages")
+        return fetched
+
+    def pool_sizes(self, db) -> list:
+        """
+        (size, goal, filter) for every pool, smallest first.
+        """
+        return sorted(
+            (meals.pool_size(goal, diet_filter, db), goal, diet_filter)
+            for goal in MEAL_GOALS for diet_filter in DIET_FILTERS
+        )
+
+    def pages_to_fetch(self, goal: str, diet_filter: str, db):
+        """
+        (buckets going stale within two rounds, oldest first; buckets never fetched).
+        """
+        entries = {
+            entry.offset_bucket: entry.fetched_at
+            for entry in db.query(models.MealCacheEntry).filter(
+                models.MealCacheEntry.goal == goal,
+                models.MealCacheEntry.diet_filter == diet_filter,
+            )
+        }
+        refresh_before = datetime.utcnow() - meals.CACHE_DURATION + timedelta(seconds=2 * MEAL_PREFETCH_INTERVAL)
+        expiring = sorted((bucket for bucket, fetched_at in entries.items() if fetched_at < refresh_before), key=entries.get)
+        missing = [bucket for bucket in range(meals.OFFSET_BUCKETS) if bucket not in entries]
+        return expiring, missing
+
+    async def fetch_page(self, goal: str, diet_filter: str, offset_bucket: int, db) -> bool:
+        """
+        Fetches and stores one page; False means stop this round (out of quota or Spoonacular failing).
+        """
+        url = meals.spoonacular_search_url(goal, diet_filter, offset_bucket * meals.MEALS_PER_PAGE)
+        try:
+            response = await http_client.get(url)
+        except httpx.HTTPError as e:
+            print(f"❌ ERROR: Meal prefetch request failed: {e!r}")
+            return False
+        if response.status_code == 402:
+            await run_in_threadpool(meals.exhaust_spoonacular_budget, db)
+            print(" Meal prefetch stopped: Spoonacular quota reached")
+            return False
+        if response.status_code != 200:
+            print(f"❌ ERROR: Meal prefetch got HTTP {response.status_code} from Spoonacular")
+            return False
+        await run_in_threadpool(meals.store_page, goal, diet_filter, offset_bucket, response.json().get("results", []), db)
+        return True
+
+
+meal_prefetcher = MealPrefetcher()
@@ -1,9 +1,14 @@
 import os
-import requests
+import threading
+import httpx
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from app.database import get_db
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal, dialect_insert, get_db
+from app.http_client import http_client
+from app.single_flight import single_flight
 from app import models, schemas
 from dotenv import load_dotenv
 import random
@@ -16,42 +21,264 @@ router = APIRouter()
 
 # Define cache duration (2 days)
 CACHE_DURATION = timedelta(days=2)
+# Results per Spoonacular request; each offset bucket is one such page
+MEALS_PER_PAGE = 10
+# Pages per (goal, filter) a live fetch picks from at random, and the most the prefetcher keeps
+OFFSET_BUCKETS = 10
+# Spoonacular requests per UTC day the background prefetcher may use (live fetches count towards it too)
+SPOONACULAR_DAILY_BUDGET = int(os.getenv("SPOONACULAR_DAILY_BUDGET", "100"))
+
+# Spoonacular nutrient name (lower-cased) -> Meal column
+NUTRIENT_FIELDS = {
+    "calories": "calories",
+    "protein": "protein",
+    "carbohydrates": "carbs",
+    "fat": "fats",
+}
+
+# Served-from-pool vs fetched-from-Spoonacular counts for this process
+cache_stats = {"hits": 0, "misses": 0, "refreshes": 0}
+cache_stats_lock = threading.Lock()
+
+
+def count_cache(outcome: str):
+    with cache_stats_lock:
+        cache_stats[outcome] += 1
+
+
+@router.get("/cache/metrics")
+def get_meal_cache_metrics(db: Session = Depends(get_db)):
+    """
+    Pool hit/miss counters, how many cached pages are still fresh, today's Spoonacular usage and
+    how many live fetches were issued vs joined an identical one already in flight.
+    """
+    fresh_after = datetime.utcnow() - CACHE_DURATION
+    pages = db.query(models.MealCacheEntry).count()
+    fresh = db.query(models.MealCacheEntry).filter(models.MealCacheEntry.fetched_at > fresh_after).count()
+    with cache_stats_lock:
+        stats = dict(cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hit_rate": stats["hits"] / lookups if lookups else None,
+        "cached_pages": pages,
+        "fresh_pages": fresh,
+        "cache_duration_seconds": CACHE_DURATION.total_seconds(),
+        "spoonacular_requests_today": spoonacular_requests_today(db),
+        "spoonacular_daily_budget": SPOONACULAR_DAILY_BUDGET,
+        "spoonacular_fetches": single_flight.stats("spoonacular"),
+    }
+
 
 @router.get("/{goal}", response_model=list[schemas.MealResponse])
-def get_meals(
+async def get_meals(
     goal: str,
     refresh: bool = False,
     filter: str = Query(None, description="Dietary filter like vegan, vegetarian, gluten-free, diabetic, low-carb, keto"),
     db: Session = Depends(get_db),
 ):
+    """
+    Random meals for a goal and optional dietary filter from the prefetched pool.
+    An empty pool (or `refresh=true`) waits on a live fetch of one random page.
+    """
+    #  Normalised so "Maintenance" and "maintenance " share one pool and one in-flight fetch
+    goal = goal.strip().lower()
+    diet_filter = filter.strip().lower() if filter else ""
     print(f" API Called: Fetching meals for goal = '{goal}', refresh = {refresh}, filter = {filter}")
 
-    if refresh:
-        print(" Deleting old meals before fetching new ones...")
-        deleted_rows = db.query(models.Meal).filter(models.Meal.goal == goal).delete(synchronize_session=False)
-        db.commit()
-        print(f" Deleted {deleted_rows} old meals!")
-
-
-    offset = random.randint(0, 100)
-    print(f" Random offset applied: {offset}")
-
-    url = f"https://api.spoonacular.com/recipes/complexSearch?apiKey={SPOONACULAR_API_KEY}&number=10&addRecipeNutrition=true&offset={offset}"
-
-    if filter:
-        filter = filter.lower()
-        if filter == "vegan":
-            url += "&diet=vegan"
-        elif filter == "vegetarian":
-            url += "&diet=vegetarian"
-        elif filter == "gluten-free":
-            url += "&intolerances=gluten"
-        elif filter == "diabetic":
-            url += "&maxSugar=5"
-        elif filter == "low-carb":
-            url += "&maxCarbs=20"
-        elif filter == "keto":
-            url += "&diet=ketogenic"
+    #  Step 1: Serve random picks from the pool
+    if not refresh:
+        meals = await run_in_threadpool(pool_meals, goal, diet_filter, db)
+        if meals:
+            count_cache("hits")
+            return meals
+
+    count_cache("refreshes" if refresh else "misses")
+
+    #  Step 2: Fetch a random page from Spoonacular, or join the fetch already running for this goal and filter.
+    #  The pooled connection is handed back first so it isn't held while waiting on Spoonacular.
+    await run_in_threadpool(db.close)
+    offset_bucket = await single_flight.do(
+        ("spoonacular", goal, diet_filter), lambda: fetch_live_page(goal, diet_filter),
+    )
+
+    #  Step 3: Serve the page that fetch stored
+    return await run_in_threadpool(cached_meals, goal, diet_filter, offset_bucket, db)
+
+
+async def fetch_live_page(goal: str, diet_filter: str) -> int:
+    """
+    Fetches one random page and stores it in the catalog; returns its offset bucket.
+    Runs once for all concurrent callers (see get_meals), so it uses its own session.
+    """
+    offset_bucket = random.randrange(OFFSET_BUCKETS)
+    url = spoonacular_search_url(goal, diet_filter, offset_bucket * MEALS_PER_PAGE)
+    print(f" Final API Request URL: {url}")
+    db = SessionLocal()
+    try:
+        await run_in_threadpool(record_spoonacular_request, db)
+        try:
+            response = await http_client.get(url)
+        except httpx.HTTPError as e:
+            print(f"❌ ERROR: Spoonacular request failed: {e!r}")
+            raise HTTPException(status_code=500, detail="Failed to fetch meals from Spoonacular API")
+
+        if response.status_code == 402:
+            await run_in_threadpool(exhaust_spoonacular_budget, db)
+            raise HTTPException(status_code=402, detail="Your daily Spoonacular API limit has been reached. Try again tomorrow.")
+
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail="Failed to fetch meals from Spoonacular API")
+
+        data = response.json()
+        if "results" not in data:
+            raise HTTPException(status_code=404, detail="No meals found")
+
+        await run_in_threadpool(store_page, goal, diet_filter, offset_bucket, data["results"], db)
+        return offset_bucket
+    finally:
+        await run_in_threadpool(db.close)
+
+
+def fresh_buckets(goal: str, diet_filter: str):
+    """
+    Subquery of the (goal, filter) offset buckets fetched within CACHE_DURATION.
+    """
+    return select(models.MealCacheEntry.offset_bucket).where(
+        models.MealCacheEntry.goal == goal,
+        models.MealCacheEntry.diet_filter == diet_filter,
+        models.MealCacheEntry.fetched_at > datetime.utcnow() - CACHE_DURATION,
+    )
+
+
+def pool_meals(goal: str, diet_filter: str, db: Session, count: int = MEALS_PER_PAGE):
+    """
+    Up to `count` random meals currently on one of the (goal, filter) pages that is still fresh.
+    """
+    return db.query(models.Meal).filter(
+        models.Meal.goal == goal,
+        models.Meal.diet_filter == diet_filter,
+        models.Meal.offset_bucket.in_(fresh_buckets(goal, diet_filter)),
+    ).order_by(func.random()).limit(count).all()
+
+
+def pool_size(goal: str, diet_filter: str, db: Session) -> int:
+    return db.query(func.count(models.Meal.id)).filter(
+        models.Meal.goal == goal,
+        models.Meal.diet_filter == diet_filter,
+        models.Meal.offset_bucket.in_(fresh_buckets(goal, diet_filter)),
+    ).scalar()
+
+
+def cached_meals(goal: str, diet_filter: str, offset_bucket: int, db: Session):
+    return db.query(models.Meal).filter(
+        models.Meal.goal == goal,
+        models.Meal.diet_filter == diet_filter,
+        models.Meal.offset_bucket == offset_bucket,
+    ).order_by(models.Meal.id).all()
+
+
+def store_page(goal: str, diet_filter: str, offset_bucket: int, results: list, db: Session) -> int:
+    """
+    Upserts one page of Spoonacular results into the catalog, marks the page fresh and commits.
+    Returns how many meals passed the goal's macro filters.
+    """
+    now = datetime.utcnow()
+    meals = parse_meals(results, goal)
+    upsert_meals(meals, goal, diet_filter, offset_bucket, now, db)
+    db.execute(
+        dialect_insert(db, models.MealCacheEntry.__table__)
+        .values(goal=goal, diet_filter=diet_filter, offset_bucket=offset_bucket, meal_count=len(meals), fetched_at=now)
+        .on_conflict_do_update(
+            index_elements=["goal", "diet_filter", "offset_bucket"],
+            set_={"meal_count": len(meals), "fetched_at": now},
+        )
+    )
+    db.commit()
+    print(f" Stored {len(meals)} meals in the catalog")
+    return len(meals)
+
+
+def record_spoonacular_request(db: Session, budget: int = None) -> bool:
+    """
+    Counts one Spoonacular request against today's usage. With a `budget`, the request is only
+    counted (and True returned) while today's usage is below it; live fetches pass no budget.
+    """
+    usage = models.SpoonacularUsage.__table__
+    insert = dialect_insert(db, usage).values(day=datetime.utcnow().date(), requests=1)
+    counted = db.execute(insert.on_conflict_do_update(
+        index_elements=["day"],
+        set_={"requests": usage.c.requests + 1},
+        where=usage.c.requests < budget if budget is not None else None,
+    ).returning(usage.c.requests)).first()
+    db.commit()
+    return counted is not None
+
+
+def exhaust_spoonacular_budget(db: Session):
+    """
+    Spoonacular answered 402 (out of quota): stop prefetching for the rest of the day.
+    """
+    db.query(models.SpoonacularUsage).filter(
+        models.SpoonacularUsage.day == datetime.utcnow().date(),
+        models.SpoonacularUsage.requests < SPOONACULAR_DAILY_BUDGET,
+    ).update({models.SpoonacularUsage.requests: SPOONACULAR_DAILY_BUDGET}, synchronize_session=False)
+    db.commit()
+
+
+def spoonacular_requests_today(db: Session) -> int:
+    requests_today = db.query(models.SpoonacularUsage.requests).filter(
+        models.SpoonacularUsage.day == datetime.utcnow().date()
+    ).scalar()
+    return requests_today or 0
+
+
+def upsert_meals(meals: list, goal: str, diet_filter: str, offset_bucket: int, now: datetime, db: Session):
+    """
+    Writes one fetched page into the catalog in a single INSERT ... ON CONFLICT on
+    (spoonacular_id, goal, diet_filter), so refetching a recipe updates its row instead of
+    adding another. Recipes that were on this page before but weren't returned now are
+    taken off it (their rows stay in the catalog).
+    """
+    meal_table = models.Meal.__table__
+    # One row per recipe: ON CONFLICT can't touch the same row twice in one statement
+    rows = list({
+        meal["spoonacular_id"]: {**meal, "goal": goal, "diet_filter": diet_filter, "offset_bucket": offset_bucket, "date": now}
+        for meal in meals
+    }.values())
+
+    db.query(models.Meal).filter(
+        models.Meal.goal == goal,
+        models.Meal.diet_filter == diet_filter,
+        models.Meal.offset_bucket == offset_bucket,
+        models.Meal.spoonacular_id.notin_([row["spoonacular_id"] for row in rows]),
+    ).update({models.Meal.offset_bucket: None}, synchronize_session=False)
+
+    if not rows:
+        return
+    insert = dialect_insert(db, meal_table).values(rows)
+    updated = ("food_item", "image", "calories", "protein", "carbs", "fats", "offset_bucket", "date")
+    db.execute(insert.on_conflict_do_update(
+        index_elements=["spoonacular_id", "goal", "diet_filter"],
+        set_={column: insert.excluded[column] for column in updated},
+    ))
+
+
+def spoonacular_search_url(goal: str, diet_filter: str, offset: int) -> str:
+    url = f"https://api.spoonacular.com/recipes/complexSearch?apiKey={SPOONACULAR_API_KEY}&number={MEALS_PER_PAGE}&addRecipeNutrition=true&offset={offset}"
+
+    if diet_filter == "vegan":
+        url += "&diet=vegan"
+    elif diet_filter == "vegetarian":
+        url += "&diet=vegetarian"
+    elif diet_filter == "gluten-free":
+        url += "&intolerances=gluten"
+    elif diet_filter == "diabetic":
+        url += "&maxSugar=5"
+    elif diet_filter == "low-carb":
+        url += "&maxCarbs=20"
+    elif diet_filter == "keto":
+        url += "&diet=ketogenic"
 
     if goal.lower() == "lose weight":
         url += "&maxCalories=500&minProtein=20&maxCarbs=50&maxFat=20"
@@ -60,33 +287,21 @@ def get_meals(
     elif goal.lower() == "maintenance":
         url += "&minCalories=500&maxCalories=800&minProtein=20&maxCarbs=50&maxFat=30"
 
-    print(f" Final API Request URL: {url}")
-    response = requests.get(url)
-
-    if response.status_code == 402:
-        raise HTTPException(status_code=402, detail="Your daily Spoonacular API limit has been reached. Try again tomorrow.")
+    return url
 
-    if response.status_code != 200:
-        raise HTTPException(status_code=500, detail="Failed to fetch meals from Spoonacular API")
-
-    data = response.json()
-    if "results" not in data:
-        raise HTTPException(status_code=404, detail="No meals found")
 
+def parse_meals(results: list, goal: str) -> list:
+    """
+    Turns Spoonacular search results into Meal column values, dropping recipes outside the goal's macros.
+    """
     meals = []
-    for item in data["results"]:
-        spoonacular_id = item["id"]
-        protein, carbs, fats, calories = 0, 0, 0, 0
-
+    for item in results:
+        values = dict.fromkeys(NUTRIENT_FIELDS.values(), 0)
         for nutrient in item.get("nutrition", {}).get("nutrients", []):
-            if nutrient["name"].lower() == "protein":
-                protein = nutrient["amount"]
-            elif nutrient["name"].lower() == "carbohydrates":
-                carbs = nutrient["amount"]
-            elif nutrient["name"].lower() == "fat":
-                fats = nutrient["amount"]
-            elif nutrient["name"].lower() == "calories":
-                calories = nutrient["amount"]
+            field = NUTRIENT_FIELDS.get(nutrient["name"].lower())
+            if field:
+                values[field] = nutrient["amount"]
+        calories, protein, carbs, fats = values["calories"], values["protein"], values["carbs"], values["fats"]
 
         if goal.lower() == "lose weight":
             if calories > 500 or protein < 20 or carbs > 50 or fats > 20:
@@ -98,21 +313,10 @@ def get_meals(
             if calories < 500 or calories > 800 or protein < 20 or carbs < 50 or fats > 30:
                 continue
 
-
-        meal = models.Meal(
-            food_item=item["title"],
-            image=item.get("image", ""),
-            calories=calories,
-            protein=protein,
-            carbs=carbs,
-            fats=fats,
-            goal=goal,
-            date=datetime.utcnow(),
-            spoonacular_id=spoonacular_id
-        )
-        db.add(meal)
-        meals.append(meal)
-
-    db.commit()
-    print(f" Stored {len(meals)} new meals in the database")
-    return meals
\ No newline at end of file
+        meals.append({
+            "food_item": item["title"],
+            "image": item.get("image", ""),
+            **values,
+            "spoonacular_id": item["id"],
+        })
+    return meals
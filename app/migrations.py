@@ -0,0 +1,212 @@
+# app/migrations.py
+"""
+Schema changes for tables that already exist in a deployed database.
+`Base.metadata.create_all` only creates missing tables, so new columns and
+indexes on existing tables are added here. Every step is idempotent.
+
+    python -m app.migrations
+"""
+from sqlalchemy import SmallInteger, cast, extract, func, inspect, select, text, update
+from app.database import engine
+from app.models import ActivityLog, Badge, BadgeOutbox, Comment, DailyNutrition, LoggedMeal, Meal, Post, Streak
+from app.rebuild_daily_nutrition import rebuild as rebuild_daily_nutrition
+
+MIGRATIONS = []  # Applied in order
+
+
+def migration(fn):
+    MIGRATIONS.append(fn)
+    return fn
+
+
+def add_missing_columns(conn, table: str, columns: dict):
+    """
+    Adds each `name: ddl_type` column the table doesn't have yet.
+    """
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    for name, ddl_type in columns.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+            print(f" Added column {table}.{name}")
+
+
+def create_missing_indexes(conn, model, names: set = None):
+    """
+    Creates every index declared on the model (or just those in `names`) that the database doesn't have yet.
+    """
+    existing = {index["name"] for index in inspect(conn).get_indexes(model.__tablename__)}
+    for index in model.__table__.indexes:
+        if index.info.get("dialect", conn.dialect.name) != conn.dialect.name:
+            continue
+        if names is not None and index.name not in names:
+            continue
+        if index.name not in existing:
+            index.create(conn)
+            print(f" Created index {index.name}")
+
+
+@migration
+def activity_log_time_buckets(conn, batch_size: int = 50000):
+    """
+    Stored log_date / log_hour buckets plus the composite indexes the gamification queries use.
+    """
+    add_missing_columns(conn, "activity_logs", {"log_date": "DATE", "log_hour": "SMALLINT"})
+
+    # Backfill in id ranges so a large table isn't rewritten in one statement
+    max_id = conn.execute(select(func.max(ActivityLog.id))).scalar() or 0
+    for start in range(0, max_id + 1, batch_size):
+        conn.execute(
+            update(ActivityLog)
+            .where(ActivityLog.id >= start, ActivityLog.id < start + batch_size, ActivityLog.log_date.is_(None))
+            .values(
+                log_date=func.date(ActivityLog.logged_at),
+                log_hour=cast(extract('hour', ActivityLog.logged_at), SmallInteger),
+            )
+        )
+
+    create_missing_indexes(conn, ActivityLog)
+
+
+@migration
+def unique_streak_per_user_type(conn):
+    """
+    One streak row per (user, type), which the atomic streak upsert relies on.
+    Duplicates left by concurrent inserts are dropped (newest kept); run app.recompute_streaks afterwards.
+    """
+    existing = {index["name"] for index in inspect(conn).get_indexes("streaks")}
+    if "uq_streaks_user_type" in existing:
+        return
+    deleted = conn.execute(text(
+        "DELETE FROM streaks WHERE id NOT IN (SELECT MAX(id) FROM streaks GROUP BY user_id, type)"
+    )).rowcount
+    if deleted:
+        print(f" Removed {deleted} duplicate streak rows - run `python -m app.recompute_streaks` to rebuild them")
+    create_missing_indexes(conn, Streak)
+
+
+@migration
+def post_feed_index(conn):
+    """
+    (date_posted, id) index for the community feed's keyset pagination.
+    """
+    create_missing_indexes(conn, Post)
+
+
+@migration
+def post_comment_counts(conn):
+    """
+    Denormalised posts.comment_count, backfilled once from comments, plus the comment pagination index.
+    """
+    existing = {column["name"] for column in inspect(conn).get_columns("posts")}
+    if "comment_count" not in existing:
+        add_missing_columns(conn, "posts", {"comment_count": "INTEGER NOT NULL DEFAULT 0"})
+        counts = (
+            select(func.count(Comment.id))
+            .where(Comment.post_id == Post.id)
+            .scalar_subquery()
+        )
+        conn.execute(update(Post).values(comment_count=counts))
+    create_missing_indexes(conn, Comment)
+
+
+@migration
+def community_search_indexes(conn):
+    """
+    GIN full-text indexes on post and comment content (PostgreSQL; SQLite searches an in-process index).
+    """
+    create_missing_indexes(conn, Post)
+    create_missing_indexes(conn, Comment)
+
+
+@migration
+def meal_cache_keys(conn):
+    """
+    Cache key columns on meals; rows stored before the cache existed have no bucket and are never served from it.
+    """
+    add_missing_columns(conn, "meals", {"diet_filter": "VARCHAR NOT NULL DEFAULT ''", "offset_bucket": "INTEGER"})
+    create_missing_indexes(conn, Meal, names={"ix_meals_goal_filter_bucket"})
+
+
+@migration
+def dedupe_meal_catalog(conn):
+    """
+    One meals row per (spoonacular_id, goal, diet_filter), which the catalog upsert relies on.
+    Duplicates from the insert-per-fetch days are dropped (newest kept).
+    """
+    existing = {index["name"] for index in inspect(conn).get_indexes("meals")}
+    if "uq_meals_recipe_goal_filter" in existing:
+        return
+    deleted = conn.execute(text(
+        "DELETE FROM meals WHERE id NOT IN "
+        "(SELECT MAX(id) FROM meals GROUP BY spoonacular_id, goal, diet_filter)"
+    )).rowcount
+    if deleted:
+        print(f" Removed {deleted} duplicate meal rows")
+    create_missing_indexes(conn, Meal)
+
+
+@migration
+def daily_nutrition_backfill(conn):
+    """
+    Fills the new daily_nutrition rollup from logged_meals the first time (later runs leave it alone).
+    """
+    DailyNutrition.__table__.create(conn, checkfirst=True)
+    if conn.execute(select(DailyNutrition.id).limit(1)).first() is not None:
+        return
+    written = rebuild_daily_nutrition(conn)
+    if written:
+        print(f" Backfilled {written} daily_nutrition rows")
+
+
+@migration
+def logged_meal_history_index(conn):
+    """
+    (user_id, timestamp, id) index for meal history pagination, date filters and exports.
+    """
+    create_missing_indexes(conn, LoggedMeal, names={"ix_logged_meals_user_timestamp"})
+
+
+@migration
+def logged_meal_client_keys(conn):
+    """
+    Client keys for idempotent batch meal uploads; existing rows have none.
+    """
+    add_missing_columns(conn, "logged_meals", {"client_key": "VARCHAR"})
+    create_missing_indexes(conn, LoggedMeal)
+
+
+@migration
+def unique_badge_per_user_achievement(conn):
+    """
+    One badges row per (user, achievement), which the ON CONFLICT DO NOTHING badge inserts rely on.
+    Duplicates awarded by concurrent checks are dropped (earliest kept).
+    """
+    existing = {index["name"] for index in inspect(conn).get_indexes("badges")}
+    if "uq_badges_user_achievement" in existing:
+        return
+    deleted = conn.execute(text(
+        "DELETE FROM badges WHERE id NOT IN (SELECT MIN(id) FROM badges GROUP BY user_id, achievement_id)"
+    )).rowcount
+    if deleted:
+        print(f" Removed {deleted} duplicate badge rows")
+    create_missing_indexes(conn, Badge, names={"uq_badges_user_achievement"})
+
+
+@migration
+def badge_outbox_prune_index(conn):
+    """
+    (status, created_at) index for deleting processed badge events.
+    """
+    create_missing_indexes(conn, BadgeOutbox, names={"ix_badge_outbox_status_created"})
+
+
+def run_migrations():
+    for step in MIGRATIONS:
+        print(f" Applying migration: {step.__name__}")
+        with engine.begin() as conn:
+            step(conn)
+    print(" Migrations complete")
+
+
+if __name__ == "__main__":
+    run_migrations()
@@ -1,8 +1,25 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, ForeignKey, DateTime, Date, Index, JSON, func, literal_column
+from sqlalchemy.dialects import postgresql  # noqa: F401 (registers the full-text search functions used below)
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 from app.database import Base
 
+# Text search configuration for the PostgreSQL full-text indexes; queries must use the same expression
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+
+def search_vector(content):
+    return func.to_tsvector(SEARCH_CONFIG, content)
+
+
+def postgres_only(index: Index) -> Index:
+    """
+    Marks an index as PostgreSQL-only: create_all and the migrations skip it on other databases.
+    """
+    index.info["dialect"] = "postgresql"
+    return index.ddl_if(dialect="postgresql")
+
+
 # ------------------ USERS TABLE ------------------
 class User(Base):
     __tablename__ = "users"
@@ -24,12 +41,14 @@ class User(Base):
     meals = relationship("Meal", back_populates="user")
     posts = relationship("Post", back_populates="user")
     activity_logs = relationship("ActivityLog", back_populates="user", cascade="all, delete-orphan")
+    activity_stats = relationship("UserActivityStats", back_populates="user", cascade="all, delete-orphan")
     badges = relationship("Badge", back_populates="user", cascade="all, delete-orphan")
     streaks = relationship("Streak", back_populates="user", cascade="all, delete-orphan")
     reset_codes = relationship("PasswordResetCode", back_populates="user", cascade="all, delete-orphan")
     logged_meals = relationship("LoggedMeal", back_populates="user", cascade="all, delete-orphan")
     posts = relationship("Post", back_populates="user")
     comments = relationship("Comment", back_populates="user")
+    post_likes = relationship("PostLike", back_populates="user", cascade="all, delete-orphan")
     workout_logs = relationship("WorkoutLog", back_populates="user", cascade="all, delete-orphan")
 # ------------------ PASSWORD RESET CODES TABLE ------------------
 #  Reset Code Model
@@ -73,9 +92,43 @@ class Meal(Base):
     goal = Column(String, nullable=False)    # Weight Loss, Muscle Gain, Maintenance
     date = Column(DateTime, default=datetime.utcnow)
     spoonacular_id = Column(Integer, nullable=False)
+    diet_filter = Column(String, nullable=False, default="", server_default="")  # Dietary filter it was fetched with ("" for none)
+    offset_bucket = Column(Integer, nullable=True)  # Spoonacular result page it was last seen on (None once it drops off)
 
     user = relationship("User", back_populates="meals")
 
+    __table_args__ = (
+        Index("uq_meals_recipe_goal_filter", "spoonacular_id", "goal", "diet_filter", unique=True),  # One catalog row per recipe per tag pair
+        Index("ix_meals_goal_filter_bucket", "goal", "diet_filter", "offset_bucket"),  # Cached page lookups
+    )
+
+# ------------------ MEAL CACHE TABLE ------------------
+class MealCacheEntry(Base):
+    """When each (goal, filter, offset bucket) page of Spoonacular results was last fetched."""
+    __tablename__ = "meal_cache"
+    __table_args__ = (
+        Index("uq_meal_cache_key", "goal", "diet_filter", "offset_bucket", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    goal = Column(String, nullable=False)
+    diet_filter = Column(String, nullable=False, default="")
+    offset_bucket = Column(Integer, nullable=False)
+    meal_count = Column(Integer, nullable=False, default=0)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SpoonacularUsage(Base):
+    """Spoonacular requests made per UTC day, shared by every worker for the prefetch budget."""
+    __tablename__ = "spoonacular_usage"
+    __table_args__ = (
+        Index("uq_spoonacular_usage_day", "day", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    requests = Column(Integer, nullable=False, default=0)
+
 ## ------------------ POSTS TABLE ------------------
 class Post(Base):
     __tablename__ = "posts"
@@ -83,12 +136,18 @@ class Post(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(String, nullable=False)
+    __table_args__ = (  # After `content`, which the search index expression refers to
+        Index("ix_posts_date_posted_id", "date_posted", "id"),  # Feed keyset pagination
+        postgres_only(Index("ix_posts_content_fts", search_vector(content), postgresql_using="gin")),  # /community/search
+    )
     media_url = Column(String, nullable=True)
     likes = Column(Integer, default=0)
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")  # Kept in step by add_comment
     date_posted = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="posts")
     comments = relationship("Comment", back_populates="post")
+    post_likes = relationship("PostLike", back_populates="post", cascade="all, delete-orphan")
 
 # ------------------ COMMENTS TABLE ------------------
 class Comment(Base):
@@ -98,11 +157,38 @@ class Comment(Base):
     post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(String, nullable=False)
+    __table_args__ = (  # After `content`, which the search index expression refers to
+        Index("ix_comments_post_date_posted_id", "post_id", "date_posted", "id"),  # Comment keyset pagination
+        postgres_only(Index("ix_comments_content_fts", search_vector(content), postgresql_using="gin")),  # /community/search
+    )
     date_posted = Column(DateTime, default=datetime.utcnow)
 
     post = relationship("Post", back_populates="comments")
     user = relationship("User", back_populates="comments")
 
+# ------------------ POST LIKES TABLE ------------------
+class PostLike(Base):
+    __tablename__ = "post_likes"
+    __table_args__ = (
+        Index("uq_post_likes_post_user", "post_id", "user_id", unique=True),  # One like per user per post
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    post = relationship("Post", back_populates="post_likes")
+    user = relationship("User", back_populates="post_likes")
+
+# ------------------ FEED VERSION TABLE ------------------
+class FeedVersion(Base):
+    """Single-row counter bumped by every write that changes the community feed, shared by all workers."""
+    __tablename__ = "feed_version"
+
+    id = Column(Integer, primary_key=True)  # Always 1
+    version = Column(Integer, nullable=False, default=0)
+
 # ------------------ ACHIEVEMENTS TABLE ------------------
 class Achievement(Base):
     __tablename__ = "achievements"
@@ -115,6 +201,9 @@ class Achievement(Base):
 # ------------------ GAMIFICATION BADGES TABLE ------------------
 class Badge(Base):
     __tablename__ = "badges"
+    __table_args__ = (
+        Index("uq_badges_user_achievement", "user_id", "achievement_id", unique=True),  # Each badge awarded once per user
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -124,9 +213,30 @@ class Badge(Base):
     user = relationship("User", back_populates="badges")
     achievement = relationship("Achievement")  # Fetch details of the earned badge
 
+# ------------------ BADGE OUTBOX TABLE ------------------
+class BadgeOutbox(Base):
+    """Pending badge evaluations, written with the activity so they survive restarts."""
+    __tablename__ = "badge_outbox"
+    __table_args__ = (
+        Index("ix_badge_outbox_status_created", "status", "created_at"),  # Pruning old done events
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    activity_type = Column(String, nullable=False)  # 'workout' or 'meal'
+    current_streak = Column(Integer, nullable=True)  # Snapshot at log time
+    total_logs = Column(Integer, nullable=False)  # Snapshot at log time
+    status = Column(String, nullable=False, default="pending", index=True)  # 'pending' or 'done' ('processing' while claimed); done rows are pruned after BADGE_EVENT_TTL
+    new_badges = Column(String, nullable=True)  # JSON list of badge names awarded
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
     # ------------------ STREAKS TABLE  ------------------
 class Streak(Base):
     __tablename__ = "streaks"
+    __table_args__ = (
+        Index("uq_streaks_user_type", "user_id", "type", unique=True),  # Target of the streak upsert
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -138,19 +248,48 @@ class Streak(Base):
     user = relationship("User", back_populates="streaks")
 
     # ------------------ ACTIVITY LOG TABLE ------------------
+def _logged_at(context):
+    """Default helper: the row's logged_at, so the time buckets below always agree with it."""
+    return context.get_current_parameters().get("logged_at") or datetime.utcnow()
+
+
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        Index("ix_activity_logs_user_type_logged_at", "user_id", "type", "logged_at"),
+        Index("ix_activity_logs_user_type_log_date", "user_id", "type", "log_date", "log_hour"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     type = Column(String, nullable=False)  # 'workout' or 'meal'
     logged_at = Column(DateTime, default=datetime.utcnow)
+    log_date = Column(Date, default=lambda context: _logged_at(context).date())  # UTC day of logged_at
+    log_hour = Column(SmallInteger, default=lambda context: _logged_at(context).hour)  # UTC hour of logged_at
 
     user = relationship("User", back_populates="activity_logs")
 
+    # ------------------ USER ACTIVITY STATS TABLE ------------------
+class UserActivityStats(Base):
+    """Running per-user totals, kept in step with every ActivityLog insert."""
+    __tablename__ = "user_activity_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    type = Column(String, primary_key=True)  # 'workout' or 'meal'
+    total_logs = Column(Integer, nullable=False, default=0)
+    early_logs = Column(Integer, nullable=False, default=0)  # Logged before 06:00 UTC
+    late_logs = Column(Integer, nullable=False, default=0)  # Logged at or after 22:00 UTC
+    last_log_date = Column(Date, nullable=True)
+
+    user = relationship("User", back_populates="activity_stats")
+
     # ------------------ LOGGED MEALS TABLE ------------------
 class LoggedMeal(Base):
     __tablename__ = "logged_meals"
+    __table_args__ = (
+        Index("ix_logged_meals_user_timestamp", "user_id", "timestamp", "id"),  # History pages, date ranges and exports
+        Index("uq_logged_meals_user_client_key", "user_id", "client_key", unique=True),  # Idempotent batch uploads
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -160,12 +299,45 @@ class LoggedMeal(Base):
     carbs = Column(Float, nullable=False)
     fats = Column(Float, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    client_key = Column(String, nullable=True)  # Set by /log-meals/batch uploads
 
     user = relationship("User", back_populates="logged_meals")
 
 
 User.logged_meals = relationship("LoggedMeal", back_populates="user", cascade="all, delete-orphan")
 
+# ------------------ DAILY NUTRITION TABLE ------------------
+class DailyNutrition(Base):
+    """Per-user, per-UTC-day totals of logged_meals, kept current by log_meal."""
+    __tablename__ = "daily_nutrition"
+    __table_args__ = (
+        Index("uq_daily_nutrition_user_day", "user_id", "day", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    calories = Column(Integer, nullable=False, default=0)
+    protein = Column(Float, nullable=False, default=0)
+    carbs = Column(Float, nullable=False, default=0)
+    fats = Column(Float, nullable=False, default=0)
+    meal_count = Column(Integer, nullable=False, default=0)
+
+# ------------------ EXERCISES TABLE ------------------
+class Exercise(Base):
+    """Local snapshot of the ExerciseDB catalog, written by app.sync_exercises."""
+    __tablename__ = "exercises"
+
+    id = Column(String, primary_key=True)  # ExerciseDB id, e.g. "0001"
+    name = Column(String, nullable=False)
+    body_part = Column(String, nullable=False)
+    equipment = Column(String, nullable=False)
+    target = Column(String, nullable=False)
+    gif_url = Column(String, nullable=True)
+    instructions = Column(JSON, nullable=False, default=list)
+    updated_at = Column(DateTime, nullable=False, index=True, default=datetime.utcnow)  # Last time the content changed
+    synced_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Last time a sync saw it upstream
+
 # ------------------ WORKOUT LOGS TABLE ------------------
 class WorkoutLog(Base):
     __tablename__ = "workout_logs"
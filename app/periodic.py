@@ -0,0 +1,39 @@
+# app/periodic.py
+import asyncio
+
+
+class PeriodicTask:
+    """
+    Runs `job` (an async callable) on the event loop every `interval` seconds until stopped.
+    A failed run is logged and the next one happens on schedule.
+    """
+
+    def __init__(self, name: str, job, interval: float, wait_first: bool = False):
+        self.name = name  # Used in error messages
+        self.job = job
+        self.interval = interval
+        self.wait_first = wait_first  # Sleep one interval before the first run
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        if self.wait_first:
+            await asyncio.sleep(self.interval)
+        while True:
+            try:
+                await self.job()
+            except Exception as e:
+                print(f"❌ ERROR: {self.name} failed: {e!r}")
+            await asyncio.sleep(self.interval)
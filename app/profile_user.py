@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 import os
 import shutil
 from app.database import get_db
+from app.feed_cache import feed_cache
 from app.models import User
 from app.schemas import UserProfileUpdate
 
@@ -46,6 +47,7 @@ def update_profile(user_id: int, profile_data: UserProfileUpdate, db: Session =
     user.full_name = profile_data.full_name
     user.username = profile_data.username
     user.current_weight = profile_data.current_weight  # Ensure the weight is updated as well
+    feed_cache.bump(db)  # Feed pages embed the author's name
     db.commit()
     
     return {"message": "Profile updated successfully"}
@@ -77,6 +79,7 @@ def upload_profile_picture(user_id: int, file: UploadFile = File(...), db: Sessi
 
     #  Store the accessible profile picture URL
     user.profile_picture = f"{BASE_URL}/{user_id}.{file_extension}"
+    feed_cache.bump(db)  # Feed pages embed the author's picture
     db.commit()
 
     return {"message": "Profile picture uploaded successfully", "profile_picture": user.profile_picture}
@@ -0,0 +1,59 @@
+# app/rebuild_daily_nutrition.py
+"""
+Rebuilds the daily_nutrition rollup from logged_meals.
+
+    python -m app.rebuild_daily_nutrition [--user-id 35] [--dry-run]
+
+log_meal keeps the rollup current as meals are logged; run this after importing or
+editing logged_meals directly, or if the two ever disagree. The rollup is replaced in
+one transaction with a single INSERT ... SELECT grouped by (user, UTC day).
+"""
+import argparse
+import time
+from sqlalchemy import delete, func, insert, select
+from app.database import engine
+from app.models import DailyNutrition, LoggedMeal
+
+
+def rebuild(conn, user_id: int = None) -> int:
+    """
+    Replaces the rollup rows (for one user, or everyone) on an open connection or session.
+    Returns the number of user-days written.
+    """
+    day = func.date(LoggedMeal.timestamp)
+    rollup = select(
+        LoggedMeal.user_id,
+        day,
+        func.coalesce(func.sum(LoggedMeal.calories), 0),
+        func.coalesce(func.sum(LoggedMeal.protein), 0),
+        func.coalesce(func.sum(LoggedMeal.carbs), 0),
+        func.coalesce(func.sum(LoggedMeal.fats), 0),
+        func.count(LoggedMeal.id),
+    ).where(LoggedMeal.timestamp.isnot(None)).group_by(LoggedMeal.user_id, day)
+
+    clear = delete(DailyNutrition)
+    if user_id is not None:
+        rollup = rollup.where(LoggedMeal.user_id == user_id)
+        clear = clear.where(DailyNutrition.user_id == user_id)
+
+    conn.execute(clear)
+    return conn.execute(insert(DailyNutrition).from_select(
+        ["user_id", "day", "calories", "protein", "carbs", "fats", "meal_count"], rollup,
+    )).rowcount
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily_nutrition rollup from logged_meals.")
+    parser.add_argument("--user-id", type=int, help="Only rebuild this user's days")
+    parser.add_argument("--dry-run", action="store_true", help="Compute everything but roll back the writes")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        written = rebuild(conn, args.user_id)
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    print(f" Done: {written} user-days in {time.perf_counter() - started:.1f}s"
+          + (" (dry run, nothing written)" if args.dry_run else ""))
@@ -0,0 +1,272 @@
+# app/recompute_streaks.py
+"""
+Recomputation of streaks, activity counters and badges from activity_logs.
+
+    python -m app.recompute_streaks [--batch-users 1000] [--chunk-rows 50000] [--dry-run]
+
+The (user, type) pairs to rebuild are streamed from the database in user order, so only
+one batch of users is held in memory at a time. Each batch locks its counters and streaks,
+then rolls its logs up per (user, type, log_date) in the same transaction, so activity
+logged while the job runs is either counted here or added on top once the batch commits.
+The rollup walks ix_activity_logs_user_type_log_date, so run `python -m app.migrations` first.
+"""
+import argparse
+import time
+from datetime import datetime
+import numpy as np
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from app.achievement_catalog import catalog
+from app.database import SessionLocal, dialect_insert
+from app.achievement_rules import ACTIVITY_TYPES, RULES
+from app.gamification import EARLY_HOUR, LATE_HOUR
+from app.models import ActivityLog, Badge, Streak, UserActivityStats
+
+TYPE_CODES = {activity_type: code for code, activity_type in enumerate(ACTIVITY_TYPES)}
+
+
+def stream_activity_keys(db: Session, chunk_rows: int):
+    """
+    Yields every (user_id, type) with activity logs, ordered by user and type, fetched from a server-side cursor.
+    """
+    query = db.query(
+        ActivityLog.user_id, ActivityLog.type
+    ).filter(
+        ActivityLog.type.in_(ACTIVITY_TYPES)
+    ).distinct().order_by(
+        ActivityLog.user_id, ActivityLog.type
+    ).execution_options(stream_results=True, yield_per=chunk_rows)
+
+    for user_id, activity_type in query:
+        yield user_id, activity_type
+
+
+def iter_user_batches(keys, batch_users: int):
+    """
+    Groups the ordered key stream into lists covering `batch_users` complete users each.
+    """
+    batch, users, current_user = [], 0, None
+    for key in keys:
+        if key[0] != current_user:
+            if users == batch_users:
+                yield batch
+                batch, users = [], 0
+            current_user = key[0]
+            users += 1
+        batch.append(key)
+    if batch:
+        yield batch
+
+
+def lock_batch(db: Session, keys: list):
+    """
+    Creates any missing counter and streak rows for `keys` and locks them all, in the same
+    order as log_activity_batch, so live logging for these users waits for the batch to commit.
+    Returns {(user_id, type): streak id}.
+    """
+    user_ids = sorted({user_id for user_id, _ in keys})
+    db.execute(
+        dialect_insert(db, UserActivityStats.__table__).values([
+            {"user_id": user_id, "type": activity_type, "total_logs": 0, "early_logs": 0, "late_logs": 0}
+            for user_id, activity_type in keys
+        ]).on_conflict_do_nothing(index_elements=["user_id", "type"])
+    )
+    db.execute(
+        dialect_insert(db, Streak.__table__).values([
+            {"user_id": user_id, "type": activity_type, "current_streak": 0, "best_streak": 0, "last_updated": None}
+            for user_id, activity_type in keys
+        ]).on_conflict_do_nothing(index_elements=["user_id", "type"])
+    )
+    db.query(UserActivityStats.user_id).filter(
+        UserActivityStats.user_id.in_(user_ids)
+    ).order_by(UserActivityStats.user_id, UserActivityStats.type).with_for_update().all()
+    return {
+        (row.user_id, row.type): row.id
+        for row in db.query(Streak.id, Streak.user_id, Streak.type).filter(Streak.user_id.in_(user_ids))
+        .order_by(Streak.user_id, Streak.type).with_for_update()
+    }
+
+
+def daily_rollups(db: Session, keys: list) -> list:
+    """
+    (user_id, type, day, logs, early_logs, late_logs, last_logged_at) rows for `keys`,
+    ordered by user, type and day.
+    """
+    wanted = set(keys)
+    rows = db.query(
+        ActivityLog.user_id,
+        ActivityLog.type,
+        ActivityLog.log_date,
+        func.count(ActivityLog.id),
+        func.sum(case((ActivityLog.log_hour < EARLY_HOUR, 1), else_=0)),
+        func.sum(case((ActivityLog.log_hour >= LATE_HOUR, 1), else_=0)),
+        func.max(ActivityLog.logged_at),
+    ).filter(
+        ActivityLog.user_id.in_(sorted({user_id for user_id, _ in keys})),
+        ActivityLog.type.in_(ACTIVITY_TYPES),
+    ).group_by(
+        ActivityLog.user_id, ActivityLog.type, ActivityLog.log_date
+    ).order_by(
+        ActivityLog.user_id, ActivityLog.type, ActivityLog.log_date
+    )
+    # A type first logged after the key stream was read has no locked row; live logging seeds it
+    return [row for row in rows if (row[0], row[1]) in wanted]
+
+
+def compute_batch(rows: list) -> list:
+    """
+    Recomputes streaks and counters for every (user, type) group in `rows` with NumPy.
+    Returns one dict per group.
+    """
+    user_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    type_codes = np.fromiter((TYPE_CODES[row[1]] for row in rows), dtype=np.int64, count=len(rows))
+    # Days since the epoch, so consecutive days differ by exactly 1
+    days = np.array([row[2] for row in rows], dtype="datetime64[D]").astype(np.int64)
+    logs = np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))
+    early = np.fromiter((row[4] or 0 for row in rows), dtype=np.int64, count=len(rows))
+    late = np.fromiter((row[5] or 0 for row in rows), dtype=np.int64, count=len(rows))
+
+    # A group is one (user, type); a run is a stretch of consecutive days inside a group
+    group_start = np.ones(len(rows), dtype=bool)
+    group_start[1:] = (user_ids[1:] != user_ids[:-1]) | (type_codes[1:] != type_codes[:-1])
+    run_start = group_start.copy()
+    run_start[1:] |= np.diff(days) != 1
+
+    run_lengths = np.bincount(np.cumsum(run_start) - 1)
+    run_groups = (np.cumsum(group_start) - 1)[run_start]
+
+    group_rows = np.flatnonzero(group_start)
+    group_last_rows = np.append(group_rows[1:], len(rows)) - 1
+    group_runs = np.flatnonzero(np.diff(run_groups, prepend=-1) != 0)
+    group_last_runs = np.append(group_runs[1:], len(run_lengths)) - 1
+
+    best = np.maximum.reduceat(run_lengths, group_runs)
+    current = run_lengths[group_last_runs]
+    totals = np.add.reduceat(logs, group_rows)
+    early_totals = np.add.reduceat(early, group_rows)
+    late_totals = np.add.reduceat(late, group_rows)
+
+    return [
+        {
+            "user_id": int(user_ids[first]),
+            "type": rows[first][1],
+            "current_streak": int(current[i]),
+            "best_streak": int(best[i]),
+            "total_logs": int(totals[i]),
+            "early_logs": int(early_totals[i]),
+            "late_logs": int(late_totals[i]),
+            "last_logged_at": rows[last][6],
+        }
+        for i, (first, last) in enumerate(zip(group_rows, group_last_rows))
+    ]
+
+
+def write_batch(db: Session, results: list, streak_ids: dict) -> int:
+    """
+    Bulk updates the locked streaks and counters for one batch and inserts any missing badges.
+    Returns the number of badges awarded.
+    """
+    user_ids = sorted({result["user_id"] for result in results})
+
+    db.bulk_update_mappings(Streak, [
+        {
+            "id": streak_ids[(result["user_id"], result["type"])],
+            "current_streak": result["current_streak"],
+            "best_streak": result["best_streak"],
+            "last_updated": result["last_logged_at"],
+        }
+        for result in results
+    ])
+    db.bulk_update_mappings(UserActivityStats, [
+        {
+            "user_id": result["user_id"],
+            "type": result["type"],
+            "total_logs": result["total_logs"],
+            "early_logs": result["early_logs"],
+            "late_logs": result["late_logs"],
+            "last_log_date": result["last_logged_at"].date(),
+        }
+        for result in results
+    ])
+
+    # Badge eligibility: streak badges count if the user ever reached them
+    by_user = {}
+    for result in results:
+        by_user.setdefault(result["user_id"], {})[result["type"]] = result
+
+    by_name = catalog.get(db).by_name
+    earned = {
+        (row.user_id, row.achievement_id)
+        for row in db.query(Badge.user_id, Badge.achievement_id).filter(Badge.user_id.in_(user_ids))
+    }
+
+    now = datetime.utcnow()
+    new_badges = []
+    for user_id, groups in by_user.items():
+        stats = {}
+        for activity_type, result in groups.items():
+            stats[f"{activity_type}.streak"] = result["best_streak"]
+            stats[f"{activity_type}.total_logs"] = result["total_logs"]
+            stats[f"{activity_type}.early_logs"] = result["early_logs"]
+            stats[f"{activity_type}.late_logs"] = result["late_logs"]
+
+        for badge_name in RULES.evaluate(stats):
+            achievement = by_name.get(badge_name)
+            if achievement and (user_id, achievement["id"]) not in earned:
+                earned.add((user_id, achievement["id"]))
+                new_badges.append({"user_id": user_id, "achievement_id": achievement["id"], "date_earned": now})
+
+    if not new_badges:
+        return 0
+    # Skips badges a live request awarded since `earned` was read
+    badges = Badge.__table__
+    return len(db.execute(
+        dialect_insert(db, badges)
+        .on_conflict_do_nothing(index_elements=["user_id", "achievement_id"])
+        .returning(badges.c.id),
+        new_badges,
+    ).all())
+
+
+def recompute(batch_users: int = 1000, chunk_rows: int = 50000, dry_run: bool = False):
+    """
+    Runs the full recomputation, committing once per batch of users. Safe to run while the app is serving.
+    """
+    read_db = SessionLocal()
+    write_db = SessionLocal()
+    started = time.perf_counter()
+    total_rows = total_users = total_badges = 0
+
+    try:
+        for keys in iter_user_batches(stream_activity_keys(read_db, chunk_rows), batch_users):
+            streak_ids = lock_batch(write_db, keys)
+            batch = daily_rollups(write_db, keys)
+            results = compute_batch(batch)
+            badges = write_batch(write_db, results, streak_ids)
+            if dry_run:
+                write_db.rollback()
+            else:
+                write_db.commit()
+
+            total_rows += len(batch)
+            total_users += len({result["user_id"] for result in results})
+            total_badges += badges
+            elapsed = time.perf_counter() - started
+            print(f" Recomputed {total_users} users ({total_rows} user-days) in {elapsed:.1f}s "
+                  f"- {total_rows / elapsed:,.0f} user-days/s, {total_badges} badges awarded")
+    finally:
+        read_db.close()
+        write_db.close()
+
+    elapsed = time.perf_counter() - started
+    print(f" Done: {total_users} users, {total_rows} user-days, {total_badges} badges in {elapsed:.1f}s"
+          + (" (dry run, nothing written)" if dry_run else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute streaks, activity counters and badges from activity_logs.")
+    parser.add_argument("--batch-users", type=int, default=1000, help="Users written per transaction")
+    parser.add_argument("--chunk-rows", type=int, default=50000, help="Rows fetched per round trip from the server-side cursor")
+    parser.add_argument("--dry-run", action="store_true", help="Compute everything but roll back the writes")
+    args = parser.parse_args()
+    recompute(args.batch_users, args.chunk_rows, args.dry_run)
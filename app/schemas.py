@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 
 
@@ -89,11 +89,55 @@ class LoggedMealResponse(LoggedMealRequest):
     """Schema for returning a logged meal with timestamp."""
     id: int
     timestamp: datetime
+    client_key: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class LoggedMealBatchEntry(BaseModel):
+    """One meal in a batch upload; client_key makes retrying the upload safe."""
+    client_key: str
+    food_item: str
+    calories: int
+    protein: float
+    carbs: float
+    fats: float
+    timestamp: Optional[datetime] = None  # When it was eaten; defaults to the upload time
+
+
+class LoggedMealBatchRequest(BaseModel):
+    """Schema for logging several meals at once."""
+    user_id: int
+    entries: List[LoggedMealBatchEntry]
+
+
+class NutritionTotals(BaseModel):
+    """Calories, macros and meal count over a day or a date range."""
+    calories: int = 0
+    protein: float = 0
+    carbs: float = 0
+    fats: float = 0
+    meal_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+
+class DailyNutritionResponse(NutritionTotals):
+    """One day of a user's nutrition rollup."""
+    day: date
+
+
+class NutritionSummaryResponse(BaseModel):
+    """Daily totals for a date range, only days with logged meals included."""
+    user_id: int
+    start: date
+    end: date
+    days: List[DailyNutritionResponse]
+    totals: NutritionTotals
+
+
 # ------------------ POST SCHEMAS ------------------
 class PostBase(BaseModel):
     """Base schema for a post."""
@@ -111,12 +155,26 @@ class PostResponse(PostBase):
     id: int
     user: UserPublic  #  Includes user details (full name, username, profile picture)
     likes: int
+    comment_count: int = 0
     date_posted: datetime
 
     class Config:
         from_attributes = True  #  Fix for Pydantic ORM Mode
 
 
+class PostLikeRequest(BaseModel):
+    """Schema for liking or unliking a post."""
+    user_id: int
+
+
+class PostLikeResponse(BaseModel):
+    """Schema for the result of a like or unlike."""
+    message: str
+    post_id: int
+    liked: bool  # Whether the user likes the post after the call
+    likes: int
+
+
 # ------------------ COMMENT SCHEMAS ------------------
 class CommentBase(BaseModel):
     """Base schema for a comment."""
@@ -140,6 +198,25 @@ class CommentResponse(CommentBase):
         from_attributes = True
 
 
+# ------------------ SEARCH SCHEMAS ------------------
+class SearchResult(BaseModel):
+    """Schema for one post or comment matching a community search."""
+    type: str  # "post" or "comment"
+    id: int
+    post_id: int  # The post itself, or the post the comment belongs to
+    snippet: str  # HTML-escaped matching text with matched words wrapped in <b></b>
+    rank: float
+    date_posted: datetime
+    user: UserPublic
+
+
+class SearchResponse(BaseModel):
+    """Schema for a page of community search results."""
+    query: str
+    results: List[SearchResult]
+    next_offset: Optional[int] = None  # None on the last page
+
+
 # ------------------ PASSWORD RESET SCHEMA ------------------
 class PasswordResetRequest(BaseModel):
     """Schema for password reset request."""
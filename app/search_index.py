@@ -0,0 +1,159 @@
+# app/search_index.py
+import html
+import math
+import re
+import threading
+from sqlalchemy.orm import Session
+from app.models import Comment, Post
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Kept out of the index, as PostgreSQL's english configuration does
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it",
+    "its", "my", "no", "not", "of", "on", "or", "so", "such", "that", "the", "their", "then", "there",
+    "these", "they", "this", "to", "was", "we", "were", "will", "with", "i", "me", "you", "your",
+}
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Match markers handed to ts_headline on PostgreSQL (Unicode private use, stripped from the content
+# first); they become <b></b> only after the rest of the headline is HTML-escaped
+MATCH_START = "\ue000"
+MATCH_STOP = "\ue001"
+
+
+def normalise(token: str) -> str:
+    """
+    Lower-cases a word and strips a plural / possessive "s", so "workouts" finds "workout".
+    """
+    term = token.lower()
+    if term.endswith("'s"):
+        term = term[:-2]
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        term = term[:-1]
+    return term
+
+
+def terms(content: str) -> list:
+    return [term for term in (normalise(token) for token in TOKEN_RE.findall(content or "")) if term not in STOP_WORDS]
+
+
+def render_headline(headline: str) -> str:
+    """
+    ts_headline output -> HTML-escaped snippet with the matches wrapped in <b></b>.
+    """
+    return html.escape(headline).replace(MATCH_START, "<b>").replace(MATCH_STOP, "</b>")
+
+
+def highlight(content: str, query_terms: set, words: int = 35) -> str:
+    """
+    A window of about `words` words around the first match, HTML-escaped, with matches
+    wrapped in <b></b> (the same output render_headline gives on PostgreSQL).
+    """
+    tokens = list(TOKEN_RE.finditer(content))
+    matched = [i for i, token in enumerate(tokens) if normalise(token.group()) in query_terms]
+    if not tokens:
+        return html.escape(content)
+    first = max(0, (matched[0] if matched else 0) - words // 3)
+    last = min(len(tokens), first + words) - 1
+    start = 0 if first == 0 else tokens[first].start()
+    end = len(content) if last == len(tokens) - 1 else tokens[last].end()
+
+    parts, cursor = [], start
+    for i in matched:
+        if first <= i <= last:
+            token = tokens[i]
+            parts.append(html.escape(content[cursor:token.start()]))
+            parts.append(f"<b>{html.escape(token.group())}</b>")
+            cursor = token.end()
+    parts.append(html.escape(content[cursor:end]))
+    return ("... " if start else "") + "".join(parts) + (" ..." if end < len(content) else "")
+
+
+class SearchIndex:
+    """
+    In-process inverted index over post and comment content, used for /community/search
+    when the database is SQLite (PostgreSQL uses its GIN full-text indexes instead).
+    Built from the database on the first search, then kept current by create_post and
+    add_comment calling `add()`. Ranking is BM25; every query term must match.
+    Each worker process holds its own copy.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._postings = {}  # term -> {(type, id): term frequency}
+        self._docs = {}  # (type, id) -> (post_id, user_id, date_posted, length)
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> "SearchIndex":
+        """
+        Returns the index, building it first if this process hasn't yet.
+        """
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self._load(db)
+        return self
+
+    def add(self, doc_type: str, doc_id: int, post_id: int, user_id: int, date_posted, content: str):
+        """
+        Indexes one new post or comment; a no-op until the index is built (the build will include it).
+        """
+        if not self.loaded:
+            return
+        with self._lock:
+            self._add((doc_type, doc_id), post_id, user_id, date_posted, content)
+
+    def search(self, query: str, offset: int, limit: int):
+        """
+        Returns (total matches, [(type, id, post_id, user_id, date_posted, score)]) for one page,
+        best match first, ties newest first.
+        """
+        query_terms = set(terms(query))
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in query_terms]
+            if not postings or not all(postings):
+                return 0, []
+
+            postings.sort(key=len)  # Intersect starting from the rarest term
+            candidates = set(postings[0]).intersection(*postings[1:])
+            doc_count = len(self._docs)
+            average_length = self._total_length / doc_count
+
+            scored = []
+            for key in candidates:
+                post_id, user_id, date_posted, length = self._docs[key]
+                score = 0.0
+                for matches in postings:
+                    idf = math.log(1 + (doc_count - len(matches) + 0.5) / (len(matches) + 0.5))
+                    frequency = matches[key]
+                    score += idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+                scored.append((score, date_posted, key, post_id, user_id))
+
+        scored.sort(key=lambda row: (-row[0], -row[1].timestamp()))
+        page = scored[offset:offset + limit]
+        return len(scored), [(key[0], key[1], post_id, user_id, date_posted, score)
+                             for score, date_posted, key, post_id, user_id in page]
+
+    def _load(self, db: Session):
+        self._postings, self._docs, self._total_length = {}, {}, 0
+        for post in db.query(Post.id, Post.user_id, Post.date_posted, Post.content).yield_per(5000):
+            self._add(("post", post.id), post.id, post.user_id, post.date_posted, post.content)
+        for comment in db.query(Comment.id, Comment.post_id, Comment.user_id, Comment.date_posted, Comment.content).yield_per(5000):
+            self._add(("comment", comment.id), comment.post_id, comment.user_id, comment.date_posted, comment.content)
+        self.loaded = True
+        print(f" Search index built: {len(self._docs)} documents, {len(self._postings)} terms")
+
+    def _add(self, key, post_id, user_id, date_posted, content):
+        if key in self._docs:
+            return
+        doc_terms = terms(content)
+        for term in doc_terms:
+            matches = self._postings.setdefault(term, {})
+            matches[key] = matches.get(key, 0) + 1
+        self._docs[key] = (post_id, user_id, date_posted, len(doc_terms))
+        self._total_length += len(doc_terms)
+
+
+search_index = SearchIndex()
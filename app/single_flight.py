@@ -0,0 +1,53 @@
+# app/single_flight.py
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces identical upstream fetches: while a fetch for a key is in flight, other callers
+    with the same key await it and share its result (or its exception) instead of issuing
+    their own. Keys are tuples whose first item names the upstream ("exercisedb",
+    "spoonacular"), followed by the normalised request parameters; counters are kept per
+    upstream. The fetch runs as its own task, so a caller that disconnects doesn't cancel
+    it for the others. Results are shared objects: callers must not mutate them.
+    Each worker process coalesces only its own requests.
+    """
+
+    def __init__(self):
+        self.issued = {}
+        self.coalesced = {}
+        self._in_flight = {}
+
+    async def do(self, key: tuple, fetch):
+        """
+        Returns the result of `await fetch()`, joining an in-flight call for `key` if there is one.
+        """
+        upstream = key[0]
+        task = self._in_flight.get(key)
+        if task is None:
+            self.issued[upstream] = self.issued.get(upstream, 0) + 1
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced[upstream] = self.coalesced.get(upstream, 0) + 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: tuple, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here too, in case every caller went away
+
+    def stats(self, upstream: str) -> dict:
+        issued = self.issued.get(upstream, 0)
+        coalesced = self.coalesced.get(upstream, 0)
+        return {
+            "issued": issued,
+            "coalesced": coalesced,
+            "in_flight": sum(1 for key in self._in_flight if key[0] == upstream),
+            "coalesced_rate": coalesced / (issued + coalesced) if issued + coalesced else None,
+        }
+
+
+single_flight = SingleFlight()
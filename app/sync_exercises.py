@@ -0,0 +1,33 @@
+# app/sync_exercises.py
+"""
+Downloads the full ExerciseDB catalog into the local exercises table.
+
+    python -m app.sync_exercises
+
+Only new or changed exercises are written. Running workers pick the changes up on their
+next refresh (EXERCISE_REFRESH_INTERVAL); they also re-run this download themselves once
+the snapshot is older than EXERCISE_SYNC_INTERVAL.
+"""
+import asyncio
+import time
+from app.database import Base, SessionLocal, engine
+from app.exercise_catalog import download_catalog, store_snapshot
+from app.http_client import http_client
+
+
+async def sync():
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        exercises = await download_catalog()
+        changed, removed = store_snapshot(db, exercises)
+    finally:
+        db.close()
+        await http_client.stop()
+    print(f" Done: {len(exercises)} exercises downloaded, {changed} new or changed, {removed} removed "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine, tables=[Base.metadata.tables["exercises"]])
+    asyncio.run(sync())
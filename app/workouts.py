@@ -1,23 +1,18 @@
+import asyncio
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-import requests
-import os
+from starlette.concurrency import run_in_threadpool
 from app.database import get_db
+from app.exercise_catalog import EXERCISEDB_BASE_URL, HEADERS, exercise_catalog
+from app.http_client import http_client
+from app.single_flight import single_flight
 from app.models import User, WorkoutLog
 from app.schemas import WorkoutLogRequest, WorkoutLogResponse
 
 
 router = APIRouter()
 
-# Load ExerciseDB API key from environment variables
-EXERCISEDB_API_KEY = os.getenv("EXERCISEDB_API_KEY")
-EXERCISEDB_BASE_URL = "https://exercisedb.p.rapidapi.com/exercises"
-
-HEADERS = {
-    "X-RapidAPI-Key": EXERCISEDB_API_KEY,
-    "X-RapidAPI-Host": "exercisedb.p.rapidapi.com"
-}
 #  New API Endpoint to Log Workouts
 @router.post("/log-workout", response_model=WorkoutLogResponse)
 def log_workout(request: WorkoutLogRequest, db: Session = Depends(get_db)):
@@ -61,6 +56,50 @@ def get_logged_workouts(user_id: int, db: Session = Depends(get_db)):
     return logged_workouts
 
 
+async def fetch_exercises_live(muscle_group: str, home: bool) -> list:
+    """
+    The bodyPart exercises from ExerciseDB, plus all bodyweight ones for the target on home
+    workouts (both calls go out together). Shared by every caller coalesced onto it, so don't mutate the result.
+    """
+    api_url = f"{EXERCISEDB_BASE_URL}/bodyPart/{muscle_group}?limit=100"
+    requests_to_send = [http_client.get(api_url, headers=HEADERS)]
+    if home:
+        bodyweight_url = f"{EXERCISEDB_BASE_URL}/equipment/body%20weight?limit=100"
+        requests_to_send.append(http_client.get(bodyweight_url, headers=HEADERS))
+
+    response, *extra_responses = await asyncio.gather(*requests_to_send)
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Failed to fetch workouts")
+
+    exercises = response.json()
+    print(f" DEBUG: API returned {len(exercises)} exercises")
+
+    if extra_responses:
+        bodyweight_response = extra_responses[0]
+        if bodyweight_response.status_code == 200:
+            bodyweight_exercises = bodyweight_response.json()
+            exercises.extend([
+                ex for ex in bodyweight_exercises
+                if muscle_group in ex["target"].lower()
+            ])
+    return exercises
+
+
+@router.get("/workouts/catalog")
+def get_exercise_catalog_status():
+    """
+    Size and freshness of this worker's in-memory ExerciseDB mirror, plus live-fetch coalescing counters.
+    """
+    return {
+        "exercises": len(exercise_catalog),
+        "loaded": exercise_catalog.loaded,
+        "updated_at": exercise_catalog.version,
+        "synced_at": exercise_catalog.synced_at,
+        "refreshes": exercise_catalog.refreshes,
+        "exercisedb_fetches": single_flight.stats("exercisedb"),
+    }
+
+
 @router.get("/workouts")
 async def get_workouts(
     user_id: int = Query(None, description="User ID (Optional)"),
@@ -69,7 +108,7 @@ async def get_workouts(
     db: Session = Depends(get_db)
 ):
     """
-    Fetch workouts from ExerciseDB API based on user’s activity level, workout type, and muscle group.
+    Workouts from the ExerciseDB mirror based on user’s activity level, workout type, and muscle group.
     """
 
     print(f" DEBUG: Received request - user_id={user_id}, workout_type={workout_type}, muscle_group={muscle_group}")
@@ -80,7 +119,7 @@ async def get_workouts(
             raise HTTPException(status_code=400, detail="User ID is required")
 
         # Fetch user data
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await run_in_threadpool(lambda: db.query(User).filter(User.id == user_id).first())
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -107,24 +146,20 @@ async def get_workouts(
         if muscle_group not in valid_muscle_groups:
             raise HTTPException(status_code=400, detail=f"Invalid muscle group: {muscle_group}")
 
-        api_url = f"{EXERCISEDB_BASE_URL}/bodyPart/{muscle_group}?limit=100"
-        response = requests.get(api_url, headers=HEADERS)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to fetch workouts")
-
-        exercises = response.json()
-        print(f" DEBUG: API returned {len(exercises)} exercises")
-
-        #  Fetch ALL Bodyweight Exercises for Home Workouts
-        if workout_type.lower() == "home":
-            bodyweight_url = f"{EXERCISEDB_BASE_URL}/equipment/body%20weight?limit=100"
-            bodyweight_response = requests.get(bodyweight_url, headers=HEADERS)
-            if bodyweight_response.status_code == 200:
-                bodyweight_exercises = bodyweight_response.json()
-                exercises.extend([
-                    ex for ex in bodyweight_exercises
-                    if muscle_group in ex["target"].lower()
-                ])
+        home = workout_type.lower() == "home"
+        if exercise_catalog.loaded:
+            #  Answer from the in-memory ExerciseDB mirror; home workouts also get bodyweight moves for the target
+            exercises = exercise_catalog.exercises(body_part=muscle_group)
+            if home:
+                exercises = exercises + exercise_catalog.exercises(equipment="body weight", target_contains=muscle_group)
+            exercises = list({ex["id"]: ex for ex in exercises}.values())
+        else:
+            #  No snapshot yet (app.sync_exercises hasn't run): ask ExerciseDB directly.
+            #  Hand the pooled connection back first so it isn't held while waiting on ExerciseDB.
+            await run_in_threadpool(db.close)
+            exercises = await single_flight.do(
+                ("exercisedb", muscle_group, home), lambda: fetch_exercises_live(muscle_group, home),
+            )
 
         print(f" DEBUG: Final Combined Exercises Count: {len(exercises)}")
 
@@ -0,0 +1,110 @@
+# benchmarks/bench_activity_log_plans.py
+"""
+Seeds activity_logs and prints query plans and timings for the gamification hot
+queries, first in their old form without the composite indexes, then rewritten
+against log_date / log_hour with the indexes in place.
+
+    python benchmarks/bench_activity_log_plans.py [--database-url sqlite:///./bench.db] [--users 2000]
+
+Point --database-url at a scratch database: the script creates and seeds tables.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--database-url", default="sqlite:///./bench_activity_logs.db")
+parser.add_argument("--users", type=int, default=2000)
+parser.add_argument("--logs-per-user", type=int, default=200)
+parser.add_argument("--repeat", type=int, default=50, help="Timed executions per query")
+args = parser.parse_args()
+os.environ["DATABASE_URL"] = args.database_url
+
+from sqlalchemy import case, extract, func, insert, select  # noqa: E402
+from app.database import Base, engine  # noqa: E402
+from app.models import ActivityLog, User  # noqa: E402
+
+NEW_INDEXES = [index for index in ActivityLog.__table__.indexes if index.name.startswith("ix_activity_logs_user_type")]
+
+
+def seed(conn):
+    if conn.execute(select(func.count(ActivityLog.id))).scalar():
+        return
+    print(f" Seeding {args.users} users x {args.logs_per_user} logs...")
+    conn.execute(insert(User), [
+        {"full_name": f"Bench {i}", "username": f"bench{i}", "email": f"bench{i}@example.com", "password": "x",
+         "activity_level": "moderate", "goal": "maintenance", "current_weight": 70, "target_weight": 70, "gender": "Other"}
+        for i in range(args.users)
+    ])
+    user_ids = conn.execute(select(User.id)).scalars().all()
+    start = datetime.utcnow() - timedelta(days=365)
+    rows = []
+    for user_id in user_ids:
+        for _ in range(args.logs_per_user):
+            logged_at = start + timedelta(minutes=random.randint(0, 365 * 24 * 60))
+            rows.append({"user_id": user_id, "type": random.choice(["workout", "meal"]), "logged_at": logged_at,
+                         "log_date": logged_at.date(), "log_hour": logged_at.hour})
+            if len(rows) == 10000:
+                conn.execute(insert(ActivityLog), rows)
+                rows = []
+    if rows:
+        conn.execute(insert(ActivityLog), rows)
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(engine)
+    if compiled.positiontup is not None:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    for row in conn.exec_driver_sql(prefix + str(compiled), params):
+        print("     ", row[-1])
+
+
+def run(conn, label, stmt):
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        conn.execute(stmt).all()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / args.repeat
+    print(f"   {label}: {elapsed_ms:.2f} ms")
+    explain(conn, stmt)
+
+
+def hot_queries(user_id, use_buckets):
+    today = datetime.utcnow().date()
+    day = ActivityLog.log_date if use_buckets else func.date(ActivityLog.logged_at)
+    hour = ActivityLog.log_hour if use_buckets else extract("hour", ActivityLog.logged_at)
+    return {
+        "first log today": select(ActivityLog.id).where(
+            ActivityLog.user_id == user_id, ActivityLog.type == "workout", day == today).limit(1),
+        "early / late counts": select(
+            func.sum(case((hour < 6, 1), else_=0)), func.sum(case((hour >= 22, 1), else_=0))
+        ).where(ActivityLog.user_id == user_id, ActivityLog.type == "workout"),
+        "daily rollup (one user)": select(day, func.count(ActivityLog.id)).where(
+            ActivityLog.user_id == user_id, ActivityLog.type == "workout").group_by(day).order_by(day),
+    }
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        seed(conn)
+        user_id = conn.execute(select(func.min(ActivityLog.user_id))).scalar()
+
+        for index in NEW_INDEXES:
+            index.drop(conn, checkfirst=True)
+        print(" BEFORE: func.date / extract(hour), no composite indexes")
+        for label, stmt in hot_queries(user_id, use_buckets=False).items():
+            run(conn, label, stmt)
+
+        for index in NEW_INDEXES:
+            index.create(conn, checkfirst=True)
+        print(" AFTER: log_date / log_hour with composite indexes")
+        for label, stmt in hot_queries(user_id, use_buckets=True).items():
+            run(conn, label, stmt)
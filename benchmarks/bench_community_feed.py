@@ -0,0 +1,103 @@
+# benchmarks/bench_community_feed.py
+"""
+Seeds posts and times the community feed: the old unpaginated version (every post
+plus one author query per post) against keyset pages taken at increasing depth.
+Page latency should stay flat however deep the cursor is.
+
+    python benchmarks/bench_community_feed.py [--database-url sqlite:///./bench.db] [--posts 50000]
+
+Point --database-url at a scratch database: the script creates and seeds tables.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--database-url", default="sqlite:///./bench_community_feed.db")
+parser.add_argument("--users", type=int, default=1000)
+parser.add_argument("--posts", type=int, default=50000)
+parser.add_argument("--limit", type=int, default=20, help="Posts per page")
+parser.add_argument("--repeat", type=int, default=20, help="Timed executions per page")
+args = parser.parse_args()
+os.environ["DATABASE_URL"] = args.database_url
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from app import models, schemas  # noqa: E402
+from app.community import load_feed_page, user_public  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+
+
+def seed(conn):
+    if conn.execute(select(func.count(models.Post.id))).scalar():
+        return
+    print(f" Seeding {args.users} users and {args.posts} posts...")
+    conn.execute(insert(models.User), [
+        {"full_name": f"Bench {i}", "username": f"feedbench{i}", "email": f"feedbench{i}@example.com", "password": "x",
+         "activity_level": "moderate", "goal": "maintenance", "current_weight": 70, "target_weight": 70, "gender": "Other"}
+        for i in range(args.users)
+    ])
+    user_ids = conn.execute(select(models.User.id)).scalars().all()
+    start = datetime.utcnow() - timedelta(days=365)
+    rows = [
+        {"user_id": random.choice(user_ids), "content": f"Post {i}", "likes": 0,
+         "date_posted": start + timedelta(seconds=random.randint(0, 365 * 24 * 3600))}
+        for i in range(args.posts)
+    ]
+    for offset in range(0, len(rows), 10000):
+        conn.execute(insert(models.Post), rows[offset:offset + 10000])
+
+
+def old_feed(db):
+    """
+    The feed as it was: all posts, then one author query per post.
+    """
+    responses = []
+    for post in db.query(models.Post).order_by(models.Post.date_posted.desc()).all():
+        user = db.query(models.User).filter(models.User.id == post.user_id).first()
+        responses.append(schemas.PostResponse(
+            id=post.id, content=post.content, media_url=post.media_url, likes=post.likes,
+            date_posted=post.date_posted, user=user_public(user),
+        ))
+    return responses
+
+
+def timed(label, fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+    print(f"   {label}: {elapsed_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        seed(conn)
+
+    db = SessionLocal()
+    try:
+        print(" BEFORE: whole feed, one author query per post")
+        timed(f"{args.posts} posts", lambda: (old_feed(db), db.expunge_all()), 1)
+
+        # Walk the feed once, keeping the cursor that starts each sampled depth
+        depths = [0, 10, 100, 1000, args.posts // args.limit - 1]
+        cursors, cursor, page = {}, None, 0
+        while page <= depths[-1]:
+            if page in depths:
+                cursors[page] = cursor
+            _, cursor = load_feed_page(cursor, args.limit, db)
+            db.expunge_all()
+            if cursor is None:
+                break
+            page += 1
+
+        print(f" AFTER: keyset pages of {args.limit} posts, authors joined")
+        for depth, page_cursor in cursors.items():
+            timed(f"page {depth}", lambda: (load_feed_page(page_cursor, args.limit, db), db.expunge_all()), args.repeat)
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+# benchmarks/bench_community_stream.py
+"""
+Load test for the live community hub on one event loop: opens thousands of idle
+/community/stream subscribers (each running the real SSE generator), reports the
+memory they hold, then publishes events from a worker thread, as route handlers do,
+and times how long each takes to reach every subscriber. One subscriber never reads
+and must be disconnected as a slow consumer without holding up the rest.
+
+    python benchmarks/bench_community_stream.py [--subscribers 5000] [--events 200]
+
+Sockets are not opened, so this measures the hub and generator cost per connection,
+not the kernel or server side of holding the TCP connections.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--subscribers", type=int, default=5000)
+parser.add_argument("--events", type=int, default=200)
+parser.add_argument("--queue-size", type=int, default=100)
+args = parser.parse_args()
+
+from app.community_hub import CommunityHub  # noqa: E402
+
+
+async def idle_client(hub, subscriber, received):
+    async for chunk in hub.stream(subscriber, heartbeat=60):
+        if chunk.startswith("event: likes"):
+            received[0] += 1
+
+
+async def main():
+    hub = CommunityHub(queue_size=args.queue_size, max_subscribers=args.subscribers + 1)
+    hub.start(asyncio.get_running_loop())
+    received = [0]
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    clients = [asyncio.create_task(idle_client(hub, hub.subscribe(), received)) for _ in range(args.subscribers)]
+    await asyncio.sleep(0.1)  # Let every generator reach its first await
+    elapsed = time.perf_counter() - started
+    held = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+    print(f" {args.subscribers} idle subscribers opened in {elapsed * 1000:.0f} ms, "
+          f"{held / 1024 / 1024:.1f} MiB held ({held / args.subscribers / 1024:.1f} KiB each)")
+
+    stalled = hub.subscribe()  # Never read from
+
+    # Publish from another thread, one event at a time, timing delivery to every subscriber
+    latencies = []
+    for i in range(args.events):
+        target = received[0] + args.subscribers
+        sent = time.perf_counter()
+        threading.Thread(target=hub.publish, args=("likes", {"post_id": 1, "likes": i, "delta": 1})).start()
+        while received[0] < target:
+            await asyncio.sleep(0)
+        latencies.append(time.perf_counter() - sent)
+
+    latencies.sort()
+    print(f" {args.events} events fanned out to {args.subscribers} subscribers: "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms, "
+          f"{hub.delivered / sum(latencies):,.0f} deliveries/s")
+    print(f" Stalled subscriber disconnected: {stalled not in hub.subscribers} "
+          f"(slow disconnects: {hub.disconnected_slow}, still subscribed: {len(hub.subscribers)})")
+
+    hub.stop()
+    await asyncio.gather(*clients)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
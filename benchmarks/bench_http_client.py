@@ -0,0 +1,157 @@
+# benchmarks/bench_http_client.py
+"""
+Runs /workouts' "home" path against a local ExerciseDB stub server with a fixed
+latency, many requests at once on one event loop:
+
+  BEFORE: blocking requests.get inside the async handler, one new connection per
+          call, bodyPart and bodyweight calls one after the other
+  AFTER:  get_workouts with the shared pooled httpx client, both calls concurrent
+
+and reports throughput, latency and how many TCP connections the stub accepted.
+single_flight is bypassed in the AFTER runs: the requests are identical, so it would
+otherwise coalesce them into one fetch and hide the connection pooling being measured.
+
+    python benchmarks/bench_http_client.py [--requests 200] [--latency-ms 50]
+
+Uses a scratch SQLite database for the one user row get_workouts looks up.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--database-url", default="sqlite:///./bench_http_client.db")
+parser.add_argument("--requests", type=int, default=200, help="Concurrent /workouts calls per run")
+parser.add_argument("--latency-ms", type=float, default=50, help="Stub server response delay")
+args = parser.parse_args()
+os.environ["DATABASE_URL"] = args.database_url
+
+import requests  # noqa: E402
+from app import workouts  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.http_client import http_client  # noqa: E402
+from app.models import User  # noqa: E402
+
+EXERCISES = json.dumps([
+    {"id": str(i), "name": f"exercise {i}", "equipment": "body weight" if i % 2 else "barbell",
+     "gifUrl": f"https://example.com/{i}.gif", "target": "chest" if i % 3 else "pectorals", "instructions": ["Go"]}
+    for i in range(100)
+]).encode()
+
+
+class StubExerciseDB(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    connections = None  # multiprocessing.Value shared with the benchmark process
+
+    def setup(self):
+        with StubExerciseDB.connections.get_lock():
+            StubExerciseDB.connections.value += 1
+        super().setup()
+
+    def do_GET(self):
+        time.sleep(args.latency_ms / 1000)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(EXERCISES)))
+        self.end_headers()
+        self.wfile.write(EXERCISES)
+
+    def log_message(self, *_):
+        pass
+
+
+class NoCoalescing:
+    """
+    Stands in for single_flight so every get_workouts call reaches the stub.
+    """
+
+    async def do(self, key, fetch):
+        return await fetch()
+
+
+async def old_home_workouts(muscle_group):
+    """
+    The fetch part of get_workouts as it was: blocking calls inside an async handler.
+    """
+    response = requests.get(f"{workouts.EXERCISEDB_BASE_URL}/bodyPart/{muscle_group}?limit=100", headers=workouts.HEADERS)
+    exercises = response.json()
+    bodyweight = requests.get(f"{workouts.EXERCISEDB_BASE_URL}/equipment/body%20weight?limit=100", headers=workouts.HEADERS)
+    exercises.extend(ex for ex in bodyweight.json() if muscle_group in ex["target"].lower())
+    return exercises
+
+
+def serve(port, connections):
+    """
+    Runs the stub in its own process so it doesn't compete with the benchmark for the GIL.
+    """
+    StubExerciseDB.connections = connections
+    ThreadingHTTPServer.request_queue_size = 1024  # Don't drop connection bursts at the listen backlog
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubExerciseDB)
+    server.daemon_threads = True
+    port.value = server.server_address[1]
+    server.serve_forever()
+
+
+async def run(label, make_call, connections):
+    connections.value = 0
+    latencies = []
+
+    async def timed_call():
+        started = time.perf_counter()
+        await make_call()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed_call() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"   {label}: {args.requests / elapsed:,.1f} req/s, p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms, {connections.value} connections opened")
+
+
+async def main(user_id, connections):
+    db = SessionLocal()
+    try:
+        print(f" BEFORE: blocking requests.get, sequential calls ({args.requests} concurrent requests)")
+        await run("home workouts", lambda: old_home_workouts("chest"), connections)
+
+        print(" AFTER: pooled httpx.AsyncClient, concurrent calls")
+        await http_client.start()
+        workouts.single_flight = NoCoalescing()
+        for label in ("home workouts (cold pool)", "home workouts (warm pool)"):
+            await run(label, lambda: workouts.get_workouts(
+                user_id=user_id, workout_type="home", muscle_group="chest", db=db), connections)
+        await http_client.stop()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == "httpbench").first()
+        if not user:
+            user = User(full_name="Bench", username="httpbench", email="httpbench@example.com", password="x",
+                        activity_level="moderate", goal="maintenance", current_weight=70, target_weight=70, gender="Other")
+            db.add(user)
+            db.commit()
+        user_id = user.id
+
+    port, connections = multiprocessing.Value("i", 0), multiprocessing.Value("i", 0)
+    stub = multiprocessing.Process(target=serve, args=(port, connections), daemon=True)
+    stub.start()
+    while not port.value:
+        time.sleep(0.01)
+    workouts.EXERCISEDB_BASE_URL = f"http://127.0.0.1:{port.value}/exercises"
+
+    try:
+        asyncio.run(main(user_id, connections))
+    finally:
+        stub.terminate()
@@ -0,0 +1,105 @@
+# benchmarks/bench_post_likes.py
+"""
+Hammers one post with concurrent likes and checks the counter afterwards.
+
+The old read-modify-write (`post.likes += 1` in Python, then commit) loses updates
+under contention; like_post records each like in post_likes and moves the counter
+with a single UPDATE, so posts.likes must equal the number of distinct likers even
+though every user likes the post twice.
+
+    python benchmarks/bench_post_likes.py [--database-url sqlite:///./bench.db] [--users 2000] [--threads 16]
+
+Point --database-url at a scratch database: the script creates and seeds tables.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--database-url", default="sqlite:///./bench_post_likes.db")
+parser.add_argument("--users", type=int, default=2000)
+parser.add_argument("--threads", type=int, default=16)
+args = parser.parse_args()
+os.environ["DATABASE_URL"] = args.database_url
+
+from sqlalchemy import event, func, insert, select  # noqa: E402
+from app import models, schemas  # noqa: E402
+from app.community import like_post  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def wait_for_locks(dbapi_connection, _):
+        # Queue writers instead of failing with "database is locked"
+        dbapi_connection.execute("PRAGMA busy_timeout = 30000")
+
+
+def seed_users():
+    with engine.begin() as conn:
+        if not conn.execute(select(func.count(models.User.id)).where(models.User.username.like("likebench%"))).scalar():
+            print(f" Seeding {args.users} users...")
+            conn.execute(insert(models.User), [
+                {"full_name": f"Bench {i}", "username": f"likebench{i}", "email": f"likebench{i}@example.com",
+                 "password": "x", "activity_level": "moderate", "goal": "maintenance",
+                 "current_weight": 70, "target_weight": 70, "gender": "Other"}
+                for i in range(args.users)
+            ])
+        return conn.execute(
+            select(models.User.id).where(models.User.username.like("likebench%")).limit(args.users)
+        ).scalars().all()
+
+
+def new_post(user_id):
+    with engine.begin() as conn:
+        return conn.execute(
+            insert(models.Post).values(user_id=user_id, content="Like me", likes=0).returning(models.Post.id)
+        ).scalar()
+
+
+def old_like(post_id, _user_id):
+    db = SessionLocal()
+    try:
+        post = db.query(models.Post).filter(models.Post.id == post_id).first()
+        post.likes += 1
+        db.commit()
+    finally:
+        db.close()
+
+
+def new_like(post_id, user_id):
+    db = SessionLocal()
+    try:
+        like_post(post_id, schemas.PostLikeRequest(user_id=user_id), db)
+    finally:
+        db.close()
+
+
+def hammer(label, fn, post_id, user_ids):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(lambda user_id: fn(post_id, user_id), user_ids))
+    elapsed = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        likes = conn.execute(select(models.Post.likes).where(models.Post.id == post_id)).scalar()
+        ledger = conn.execute(select(func.count(models.PostLike.id)).where(models.PostLike.post_id == post_id)).scalar()
+    print(f"   {label}: {len(user_ids)} calls in {elapsed:.2f}s ({len(user_ids) / elapsed:,.0f}/s) "
+          f"- likes={likes}, post_likes rows={ledger}")
+    return likes
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    user_ids = seed_users()
+
+    print(f" BEFORE: read-modify-write counter, {args.threads} threads")
+    likes = hammer("one like per user", old_like, new_post(user_ids[0]), user_ids)
+    print(f"   lost updates: {len(user_ids) - likes}")
+
+    print(f" AFTER: post_likes ledger + atomic UPDATE, {args.threads} threads")
+    likes = hammer("every user likes twice", new_like, new_post(user_ids[0]), user_ids * 2)
+    print(f"   lost updates: {len(user_ids) - likes}")
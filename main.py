@@ -1,18 +1,25 @@
 # app/main.py
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles 
 from app.auth import router as auth_router
-from app.database import Base, engine
+from app.database import Base, SessionLocal, engine
 from app.meals import router as meals_router
+from app.meal_prefetcher import meal_prefetcher
 from app.log_meals import router as log_meals_router
 from app.workouts import router as workouts_router
-from app.gamification import router as gamification_router
+from app.exercise_catalog import exercise_catalog
+from app.gamification import router as gamification_router, badge_queue, pending_badge_events
 from app.community import router as community_router 
+from app.community_hub import community_hub
+from app.http_client import http_client
 from app.profile_user import router as profile_router 
 from app.ai_suggestions import router as ai_router 
+from app.leaderboard import leaderboard
 import joblib # type: ignore
 import numpy as np
 import sys
@@ -26,8 +33,33 @@ load_dotenv()
 #  Initialize Database
 Base.metadata.create_all(bind=engine)
 
+#  Startup / shutdown hooks
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #  Build the in-memory streak leaderboard and exercise catalog, and resume unfinished badge checks
+    db = SessionLocal()
+    try:
+        leaderboard.rebuild(db)
+        exercise_catalog.load(db)
+        pending = pending_badge_events(db)
+    finally:
+        db.close()
+    badge_queue.start(pending)
+    community_hub.start(asyncio.get_running_loop(), engine)
+    await http_client.start()
+    meal_prefetcher.start()
+    exercise_catalog.start()
+    leaderboard.start()
+    yield
+    await leaderboard.stop()
+    await exercise_catalog.stop()
+    await meal_prefetcher.stop()
+    await http_client.stop()
+    community_hub.stop()
+    badge_queue.stop()
+
 #  Initialize FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 #  Allow CORS (fixes "Failed to fetch" issue)
 app.add_middleware(
@@ -36,6 +68,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -1,3 +1,5 @@
+import asyncio
+import json
 import os
 import sys
 import pytest
@@ -37,3 +39,150 @@ async def test_add_comment_to_post():
         data = response.json()
         assert data["content"] == comment_payload["content"]
         assert data["post_id"] == comment_payload["post_id"]
+
+@pytest.mark.asyncio
+async def test_fetch_posts_paginated():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        first = await ac.get("/community/posts", params={"limit": 2})
+        assert first.status_code == 200
+        assert len(first.json()) <= 2
+
+        cursor = first.headers.get("X-Next-Cursor")
+        if cursor:
+            second = await ac.get("/community/posts", params={"limit": 2, "cursor": cursor})
+            assert second.status_code == 200
+            first_ids = {post["id"] for post in first.json()}
+            assert not first_ids & {post["id"] for post in second.json()}
+
+        bad = await ac.get("/community/posts", params={"cursor": "not-a-cursor"})
+        assert bad.status_code == 400
+
+@pytest.mark.asyncio
+async def test_comment_count_and_paginated_comments():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        post = await ac.post("/community/create-post", json={"user_id": 35, "content": "Leg day done"})
+        assert post.status_code == 200
+        post_id = post.json()["id"]
+        assert post.json()["comment_count"] == 0
+
+        for i in range(3):
+            response = await ac.post("/community/add-comment", json={"user_id": 35, "post_id": post_id, "content": f"Nice {i}"})
+            assert response.status_code == 200
+
+        first = await ac.get(f"/community/comments/{post_id}", params={"limit": 2})
+        assert [c["content"] for c in first.json()] == ["Nice 0", "Nice 1"]
+        second = await ac.get(f"/community/comments/{post_id}", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+        assert [c["content"] for c in second.json()] == ["Nice 2"]
+        assert "X-Next-Cursor" not in second.headers
+
+        feed = await ac.get("/community/posts")
+        counts = {p["id"]: p["comment_count"] for p in feed.json()}
+        assert counts.get(post_id) == 3
+
+@pytest.mark.asyncio
+async def test_like_and_unlike_post_idempotent():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        post = await ac.post("/community/create-post", json={"user_id": 35, "content": "Like test"})
+        post_id = post.json()["id"]
+
+        first = await ac.post(f"/community/like/{post_id}", json={"user_id": 35})
+        again = await ac.post(f"/community/like/{post_id}", json={"user_id": 35})
+        assert first.status_code == again.status_code == 200
+        assert first.json()["likes"] == again.json()["likes"] == 1
+        assert again.json()["liked"] is True
+
+        unlike = await ac.delete(f"/community/like/{post_id}", params={"user_id": 35})
+        unlike_again = await ac.delete(f"/community/like/{post_id}", params={"user_id": 35})
+        assert unlike.json()["likes"] == unlike_again.json()["likes"] == 0
+        assert unlike_again.json()["liked"] is False
+
+@pytest.mark.asyncio
+async def test_fetch_posts_conditional_get():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        first = await ac.get("/community/posts")
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+
+        cached = await ac.get("/community/posts", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+        await ac.post("/community/create-post", json={"user_id": 35, "content": "Fresh post"})
+        changed = await ac.get("/community/posts", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+
+        cursor = changed.headers.get("X-Next-Cursor")
+        if cursor:
+            second = await ac.get("/community/posts", params={"cursor": cursor}, headers={"If-None-Match": changed.headers["ETag"]})
+            assert second.status_code == 200
+
+@pytest.mark.asyncio
+async def test_feed_shows_renamed_author():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        profile = (await ac.get("/profile/35")).json()
+        await ac.post("/community/create-post", json={"user_id": 35, "content": "Rename test"})
+        first = await ac.get("/community/posts")
+        etag = first.headers["ETag"]
+
+        renamed = {"full_name": "Renamed Author", "username": profile["username"], "current_weight": profile["current_weight"]}
+        try:
+            assert (await ac.put("/profile/35", json=renamed)).status_code == 200
+            feed = await ac.get("/community/posts", headers={"If-None-Match": etag})
+            assert feed.status_code == 200
+            authors = {p["user"]["full_name"] for p in feed.json() if p["user"]["id"] == 35}
+            assert authors == {"Renamed Author"}
+        finally:
+            await ac.put("/profile/35", json={**renamed, "full_name": profile["full_name"]})
+
+
+@pytest.mark.asyncio
+async def test_stream_receives_new_post():
+    async with AsyncClient(base_url=BASE_URL, timeout=10) as ac:
+        async with ac.stream("GET", "/community/stream") as stream:
+            assert stream.status_code == 200
+            assert stream.headers["content-type"].startswith("text/event-stream")
+            lines = stream.aiter_lines()
+            assert await anext(lines) == ": connected"
+
+            await ac.post("/community/create-post", json={"user_id": 35, "content": "Streaming now"})
+
+            async def next_post():
+                event = None
+                async for line in lines:
+                    if line.startswith("event: "):
+                        event = line.removeprefix("event: ")
+                    elif line.startswith("data: ") and event == "post":
+                        return json.loads(line.removeprefix("data: "))
+
+            post = await asyncio.wait_for(next_post(), 5)
+            assert post["content"] == "Streaming now"
+
+@pytest.mark.asyncio
+async def test_search_posts_and_comments():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        post = await ac.post("/community/create-post", json={"user_id": 35, "content": "Kettlebell swings every morning"})
+        post_id = post.json()["id"]
+        await ac.post("/community/add-comment", json={"user_id": 35, "post_id": post_id, "content": "Kettlebell swings are brutal"})
+
+        response = await ac.get("/community/search", params={"q": "kettlebell swings", "limit": 1})
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["results"]) == 1
+        assert "<b>" in data["results"][0]["snippet"]
+        assert data["next_offset"] == 1
+
+        rest = await ac.get("/community/search", params={"q": "kettlebell swings", "offset": data["next_offset"]})
+        found = {(r["type"], r["post_id"]) for r in data["results"] + rest.json()["results"]}
+        assert {("post", post_id), ("comment", post_id)} <= found
+
+@pytest.mark.asyncio
+async def test_search_snippets_are_escaped():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        await ac.post("/community/create-post", json={"user_id": 35, "content": "<img src=x onerror=alert(1)> deadlift form"})
+
+        response = await ac.get("/community/search", params={"q": "deadlift"})
+        assert response.status_code == 200
+        snippet = response.json()["results"][0]["snippet"]
+        assert "<img" not in snippet
+        assert "&lt;img" in snippet
+        assert "<b>deadlift</b>" in snippet
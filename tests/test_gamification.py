@@ -1,6 +1,8 @@
+import asyncio
 import os
 import sys
 import pytest
+from datetime import datetime, timedelta
 from httpx import AsyncClient
 
 os.environ["ENV"] = "test"
@@ -29,3 +31,94 @@ async def test_fetch_user_progress():
         assert "current_streaks" in data
         assert "best_streaks" in data
         assert "total_logs" in data
+
+@pytest.mark.asyncio
+async def test_all_achievements_conditional_get():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        response = await ac.get("/gamification/all-achievements")
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        cached = await ac.get("/gamification/all-achievements", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+@pytest.mark.asyncio
+async def test_fetch_leaderboard():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        response = await ac.get("/gamification/leaderboard", params={"type": "workout", "window": "best", "user_id": 35})
+        assert response.status_code == 200
+        data = response.json()
+        ranks = [entry["rank"] for entry in data["top"]]
+        assert ranks == sorted(ranks)
+        assert "me" in data
+
+@pytest.mark.asyncio
+async def test_log_activity_batch():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        now = datetime.utcnow()
+        events = [
+            {"user_id": 35, "activity_type": "meal", "logged_at": (now - timedelta(hours=hours)).isoformat()}
+            for hours in (3, 2, 1)
+        ]
+        response = await ac.post("/gamification/log-activity/batch", json={"events": events})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["logged"] == 3
+        assert any(streak["activity_type"] == "meal" for streak in data["streaks"])
+
+@pytest.mark.asyncio
+async def test_concurrent_log_activity():
+    parallel_requests = 25
+    async with AsyncClient(base_url=BASE_URL, timeout=30) as ac:
+        before = (await ac.get("/gamification/user-progress", params={"user_id": 35})).json()
+        start = before["total_logs"]["workout"]
+
+        responses = await asyncio.gather(*[
+            ac.post("/gamification/log-activity", json={"user_id": 35, "activity_type": "workout"})
+            for _ in range(parallel_requests)
+        ])
+        assert all(response.status_code == 200 for response in responses)
+
+        #  Every request got its own increment and the streak moved at most once
+        totals = sorted(response.json()["total_logs"] for response in responses)
+        assert totals == list(range(start + 1, start + parallel_requests + 1))
+        assert sum(1 for response in responses if response.json()["current_streak"] is not None) <= 1
+
+        after = (await ac.get("/gamification/user-progress", params={"user_id": 35})).json()
+        assert after["total_logs"]["workout"] == start + parallel_requests
+
+def test_log_activity_query_count():
+    from sqlalchemy import event
+    from app.database import SessionLocal, engine
+    from app.gamification import ActivityLogRequest, evaluate_badge_event, log_activity
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.lstrip().split()[0].upper())
+
+    db = SessionLocal()
+    try:
+        #  Warm-up log so today's streak is already counted and the counters exist
+        warm_up = log_activity(ActivityLogRequest(user_id=35, activity_type="workout"), db)
+        evaluate_badge_event(warm_up["badge_event_id"])
+        db.close()
+        db = SessionLocal()
+
+        event.listen(engine, "before_cursor_execute", record)
+        result = log_activity(ActivityLogRequest(user_id=35, activity_type="workout"), db)
+        request_statements = list(statements)
+        statements.clear()
+        evaluate_badge_event(result["badge_event_id"])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+
+    #  Request path: user, counters; counter update, streak upsert, activity insert, outbox insert
+    assert request_statements.count("SELECT") == 2
+    assert request_statements.count("INSERT") + request_statements.count("UPDATE") == 4
+
+    #  Background check: outbox event, counters for every type the rules need, earned badges
+    assert statements.count("SELECT") == 3
+    #  the claim, at most one bulk badge insert, and the outbox update
+    assert statements.count("INSERT") + statements.count("UPDATE") <= 3
@@ -26,3 +26,81 @@ async def test_meal_fetch_and_log():
         })
         assert log_res.status_code == 200
         assert "id" in log_res.json()
+
+@pytest.mark.asyncio
+async def test_meal_cache_metrics():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        before = (await ac.get("/meals/cache/metrics")).json()
+        res = await ac.get("/meals/maintenance")
+        assert res.status_code == 200
+
+        after = (await ac.get("/meals/cache/metrics")).json()
+        assert after["hits"] + after["misses"] == before["hits"] + before["misses"] + 1
+        assert after["cached_pages"] >= 1
+
+@pytest.mark.asyncio
+async def test_meals_served_from_pool():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        first = await ac.get("/meals/maintenance")
+        assert first.status_code == 200 and first.json()
+
+        before = (await ac.get("/meals/cache/metrics")).json()
+        res = await ac.get("/meals/maintenance")
+        assert res.status_code == 200 and res.json()
+
+        after = (await ac.get("/meals/cache/metrics")).json()
+        assert after["hits"] == before["hits"] + 1
+        assert "spoonacular_daily_budget" in after
+        assert {"issued", "coalesced"} <= set(after["spoonacular_fetches"])
+
+@pytest.mark.asyncio
+async def test_nutrition_summary_tracks_logged_meals():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        before = (await ac.get("/log-meals/35/summary")).json()
+
+        log_res = await ac.post("/log-meals/", json={
+            "user_id": 35, "food_item": "Summary Test Oats", "calories": 321, "protein": 12, "carbs": 54, "fats": 6
+        })
+        assert log_res.status_code == 200
+
+        after = (await ac.get("/log-meals/35/summary")).json()
+        assert after["totals"]["calories"] == before["totals"]["calories"] + 321
+        assert after["totals"]["meal_count"] == before["totals"]["meal_count"] + 1
+        assert after["days"][-1]["day"] == after["end"]
+
+        bad_range = await ac.get("/log-meals/35/summary?from=2025-02-01&to=2025-01-01")
+        assert bad_range.status_code == 400
+
+@pytest.mark.asyncio
+async def test_logged_meals_pagination_and_export():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        first = await ac.get("/log-meals/35?limit=1")
+        assert first.status_code == 200 and len(first.json()) == 1
+
+        cursor = first.headers.get("X-Next-Cursor")
+        if cursor:
+            second = await ac.get(f"/log-meals/35?limit=1&cursor={cursor}")
+            assert second.status_code == 200
+            assert second.json()[0]["timestamp"] <= first.json()[0]["timestamp"]
+
+        export = await ac.get("/log-meals/35/export?format=csv")
+        assert export.status_code == 200
+        assert export.text.splitlines()[0] == "id,food_item,calories,protein,carbs,fats,timestamp"
+
+@pytest.mark.asyncio
+async def test_batch_logging_is_idempotent():
+    key = f"test-batch-{os.getpid()}"
+    payload = {"user_id": 35, "entries": [
+        {"client_key": f"{key}-1", "food_item": "Batch Eggs", "calories": 200, "protein": 14, "carbs": 2, "fats": 15,
+         "timestamp": "2026-03-01T08:00:00Z"},
+        {"client_key": f"{key}-2", "food_item": "Batch Rice", "calories": 350, "protein": 7, "carbs": 75, "fats": 1,
+         "timestamp": "2026-03-01T13:00:00Z"},
+    ]}
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        first = await ac.post("/log-meals/batch", json=payload)
+        assert first.status_code == 200
+        assert [meal["client_key"] for meal in first.json()] == [f"{key}-1", f"{key}-2"]
+
+        retry = await ac.post("/log-meals/batch", json=payload)
+        assert retry.status_code == 200
+        assert [meal["id"] for meal in retry.json()] == [meal["id"] for meal in first.json()]
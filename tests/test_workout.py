@@ -20,3 +20,12 @@ async def test_workout_fetch_and_log():
             "equipment": workout["equipment"]
         })
         assert log.status_code == 200 and "id" in log.json()
+
+@pytest.mark.asyncio
+async def test_exercise_catalog_status():
+    async with AsyncClient(base_url=BASE_URL) as ac:
+        res = await ac.get("/workouts/catalog")
+        assert res.status_code == 200
+        status = res.json()
+        assert status["loaded"] == (status["exercises"] > 0)
+        assert {"issued", "coalesced"} <= set(status["exercisedb_fetches"])